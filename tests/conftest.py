@@ -36,4 +36,12 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
+    'tests.query_budget',
 ]
+
+
+def pytest_configure(config):
+    # Те же настройки, что у manage.py test (core.testing.TestRunner).
+    from core import testing
+
+    testing.override().enable()
@@ -0,0 +1,101 @@
+"""Плагин pytest: бюджет SQL-запросов на вид.
+
+Фикстура ``budget_client`` — тестовый клиент Django, который считает
+запросы каждого ответа по имени вида (``resolver_match.view_name``).
+Тест падает, если вид превысил бюджет из маркера
+``@pytest.mark.query_budget(limit)`` или если число запросов вида
+растет вместе с числом объектов на странице (N+1). Кэш очищается
+перед каждым запросом, поэтому считается худший, холодный случай, а
+фоновые задачи, поставленные видом, не выполняются внутри ответа.
+
+После прогона в отчет выводится максимум запросов по каждому виду.
+"""
+from collections import defaultdict
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+_usage = defaultdict(int)
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(limit): наибольшее число SQL-запросов на ответ вида',
+    )
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _usage:
+        return
+    terminalreporter.section('SQL-запросы по видам')
+    for view_name, count in sorted(_usage.items()):
+        terminalreporter.write_line(f'{view_name}: {count}')
+
+
+def _page_size(response):
+    context = response.context
+    if context is None:
+        return None
+    for name in ('page_obj', 'comments'):
+        if name in context:
+            return len(context[name].object_list)
+    return None
+
+
+class BudgetClient:
+    def __init__(self, client, limit):
+        self.client = client
+        self.limit = limit
+        # Вид -> {число объектов на странице: число запросов}.
+        self.by_page_size = defaultdict(dict)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def get(self, *args, **kwargs):
+        return self._measure(self.client.get, *args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        return self._measure(self.client.post, *args, **kwargs)
+
+    def _measure(self, method, *args, **kwargs):
+        cache.clear()
+        with override_settings(TASKS_EAGER=False), \
+                CaptureQueriesContext(connection) as queries:
+            response = method(*args, **kwargs)
+        view_name = response.resolver_match.view_name
+        count = len(queries)
+        _usage[view_name] = max(_usage[view_name], count)
+        sql = '\n'.join(query['sql'] for query in queries.captured_queries)
+        assert self.limit is None or count <= self.limit, (
+            f'Вид `{view_name}` выполнил {count} SQL-запросов при бюджете '
+            f'{self.limit}:\n{sql}'
+        )
+        size = _page_size(response)
+        if size is not None:
+            seen = self.by_page_size[view_name]
+            seen[size] = max(seen.get(size, 0), count)
+            smaller = [seen[other] for other in seen if other < size]
+            larger = [seen[other] for other in seen if other > size]
+            assert count <= max(smaller, default=count) and (
+                count >= min(larger, default=count)
+            ), (
+                f'Число запросов вида `{view_name}` растет с размером '
+                f'страницы (объектов: запросов) {seen}:\n{sql}'
+            )
+        return response
+
+
+@pytest.fixture
+def budget_client(request, client):
+    marker = request.node.get_closest_marker('query_budget')
+    return BudgetClient(client, marker.args[0] if marker else None)
+
+
+@pytest.fixture
+def budget_user_client(request, user_client):
+    marker = request.node.get_closest_marker('query_budget')
+    return BudgetClient(user_client, marker.args[0] if marker else None)
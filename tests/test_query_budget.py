@@ -0,0 +1,61 @@
+import pytest
+
+from posts.models import Comment, Follow, Post
+
+
+class TestQueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.query_budget(3)
+    def test_index(self, budget_client, mixer, post_with_group, user, group):
+        budget_client.get('/')
+        mixer.cycle(15).blend(Post, author=user, group=group)
+        budget_client.get('/')
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.query_budget(5)
+    def test_group_list(self, budget_client, mixer, post_with_group, user,
+                        group):
+        budget_client.get(f'/group/{group.slug}/')
+        mixer.cycle(15).blend(Post, author=user, group=group)
+        budget_client.get(f'/group/{group.slug}/')
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.query_budget(8)
+    def test_profile(self, budget_user_client, mixer, post_with_group,
+                     another_user, group):
+        mixer.blend(Post, author=another_user, group=group)
+        budget_user_client.get(f'/profile/{another_user.username}/')
+        mixer.cycle(15).blend(Post, author=another_user, group=group)
+        budget_user_client.get(f'/profile/{another_user.username}/')
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.query_budget(5)
+    def test_follow_index(self, budget_user_client, mixer, user,
+                          another_user, group):
+        Follow.objects.create(user=user, author=another_user)
+        mixer.blend(Post, author=another_user, group=group)
+        budget_user_client.get('/follow/')
+        mixer.cycle(15).blend(Post, author=another_user, group=group)
+        budget_user_client.get('/follow/')
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.query_budget(7)
+    def test_post_detail(self, budget_user_client, mixer, post_with_group,
+                         another_user):
+        url = f'/posts/{post_with_group.id}/'
+        mixer.blend(Comment, post=post_with_group, author=another_user)
+        budget_user_client.get(url)
+        mixer.cycle(15).blend(
+            Comment, post=post_with_group, author=mixer.SELECT
+        )
+        budget_user_client.get(url)
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.query_budget(5)
+    def test_search(self, budget_client, mixer, post_with_group, user, group):
+        budget_client.get('/search/', {'q': 'Тестовый'})
+        mixer.cycle(15).blend(
+            Post, author=user, group=group, text='Тестовый пост'
+        )
+        budget_client.get('/search/', {'q': 'Тестовый'})
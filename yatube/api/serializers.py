@@ -0,0 +1,52 @@
+from django.core.files.storage import default_storage
+
+# Поле ответа -> колонка values(); связи читаются в том же запросе.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+}
+POST_DETAIL_FIELDS = (*POST_FIELDS, 'comments_count')
+# Ключ курсора ленты нужен всегда, даже если его нет в fields=.
+CURSOR_COLUMNS = ('id', 'pub_date')
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def requested_fields(request, allowed):
+    """Поля из ?fields=a,b или все разрешенные поля."""
+    raw = request.GET.get('fields', '')
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    if not fields:
+        return list(allowed)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise FieldsError(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def post_columns(fields):
+    return sorted(
+        set(CURSOR_COLUMNS)
+        | {POST_FIELDS[field] for field in fields if field in POST_FIELDS}
+    )
+
+
+def post(row, fields):
+    """Строка values() -> словарь ответа с запрошенными полями."""
+    data = {}
+    for field in fields:
+        if field not in POST_FIELDS:
+            continue
+        value = row[POST_FIELDS[field]]
+        if field == 'image':
+            value = default_storage.url(value) if value else None
+        data[field] = value
+    return data
@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import tasks
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='api_author', first_name='Лев'
+        )
+        self.reader = User.objects.create_user(username='api_reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='api_group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {number}', group=self.group
+            )
+            for number in range(5)
+        ]
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get(self, name, *args, client=None, **params):
+        response = (client or self.client).get(
+            reverse(f'api:{name}', args=args), params
+        )
+        return response, response.json()
+
+    def test_index_pages_by_cursor(self):
+        """Лента отдается страницами по ссылке next"""
+        response, data = self.get('index', limit=2)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        ids = [post['id'] for post in data['results']]
+        self.assertIsNone(data['previous'])
+        while data['next']:
+            response = self.client.get(data['next'])
+            data = response.json()
+            ids += [post['id'] for post in data['results']]
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+        self.assertIsNotNone(data['previous'])
+
+    def test_post_fields(self):
+        """Пост отдается со связями и только с запрошенными полями"""
+        _, data = self.get('index')
+        first = data['results'][0]
+        self.assertEqual(first['author'], 'api_author')
+        self.assertEqual(first['group'], 'api_group')
+        self.assertEqual(first['text'], 'Пост 4')
+        self.assertIsNone(first['image'])
+        _, data = self.get('index', fields='id,author')
+        self.assertEqual(
+            data['results'][0],
+            {'id': self.posts[-1].pk, 'author': 'api_author'},
+        )
+
+    def test_unknown_field_rejected(self):
+        """Неизвестное поле в fields= дает 400"""
+        response, data = self.get('index', fields='id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['detail'])
+
+    def test_single_query_without_model_instances(self):
+        """Страница ленты — один запрос с join, без N+1"""
+        self.get('index')
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api:index'), {'limit': 5})
+
+    def test_etag_not_modified(self):
+        """Повторный запрос с ETag получает 304, новый пост меняет ETag"""
+        response, _ = self.get('index')
+        etag = response['ETag']
+        response = self.client.get(
+            reverse('api:index'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(
+            reverse('api:index'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_and_profile(self):
+        """Группа и профиль отдаются с описанием и счетчиками"""
+        Post.objects.create(author=self.reader, text='Пост без группы')
+        _, data = self.get('group_posts', 'api_group')
+        self.assertEqual(data['group']['title'], 'Группа')
+        self.assertEqual(data['group']['posts_count'], 5)
+        self.assertEqual(len(data['results']), 5)
+        Follow.objects.create(user=self.reader, author=self.author)
+        _, data = self.get(
+            'profile', 'api_author', client=self.reader_client
+        )
+        self.assertEqual(data['author']['first_name'], 'Лев')
+        self.assertEqual(data['author']['posts_count'], 5)
+        self.assertEqual(data['author']['followers_count'], 1)
+        self.assertTrue(data['author']['following'])
+        response, data = self.get('group_posts', 'missing')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(data['detail'], 'Не найдено')
+
+    def test_follow_feed(self):
+        """Лента подписок доступна только после входа"""
+        response, _ = self.get('follow_index')
+        self.assertEqual(response.status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        _, data = self.get(
+            'follow_index', client=self.reader_client, fields='id'
+        )
+        self.assertEqual(
+            data['results'],
+            [{'id': post.pk} for post in reversed(self.posts)],
+        )
+
+    @override_settings(TASKS_EAGER=False)
+    def test_follow_feed_etag_after_worker(self):
+        """Пост, разложенный воркером, меняет ETag ленты подписок"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        tasks.run(tasks.claim(100, 60))
+        post = Post.objects.create(author=self.author, text='Из очереди')
+        response, data = self.get(
+            'follow_index', client=self.reader_client, fields='id', limit=1
+        )
+        self.assertNotEqual(data['results'], [{'id': post.pk}])
+        tasks.run(tasks.claim(100, 60))
+        response = self.reader_client.get(
+            reverse('api:follow_index'), {'fields': 'id', 'limit': 1},
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'id': post.pk}])
+
+    def test_post_detail(self):
+        """Пост отдается с числом комментариев"""
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        _, data = self.get('post_detail', post.pk)
+        self.assertEqual(data['text'], 'Пост 0')
+        self.assertEqual(data['comments_count'], 1)
+        response, _ = self.get('post_detail', 0)
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,170 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from posts import counters, timeline
+from posts.conditional import (follow_scopes, group_scopes, index_scopes,
+                               post_detail_scopes, profile_scopes, versioned)
+from posts.models import Follow, Group, Post, TimelineEntry, User
+from posts.paginators import paginate
+
+from . import serializers
+
+
+def respond(data, status=200):
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def api_view(view):
+    """Только GET; ошибка в ?fields= дает 400 с описанием."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except serializers.FieldsError as error:
+            return respond({'detail': str(error)}, 400)
+    return wrapper
+
+
+def not_found():
+    return respond({'detail': 'Не найдено'}, 404)
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.GLOBAL_COUNT_POSTS))
+    except ValueError:
+        size = settings.GLOBAL_COUNT_POSTS
+    return min(max(size, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def page_url(request, cursor):
+    if not cursor:
+        return None
+    params = request.GET.copy()
+    params.pop('page', None)
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def links(request, page_obj):
+    return {
+        'next': page_url(request, page_obj.next_cursor),
+        'previous': page_url(request, page_obj.previous_cursor),
+    }
+
+
+def post_page(request, queryset, fields):
+    """Страница постов из values() без создания экземпляров Post."""
+    page_obj = paginate(
+        request,
+        queryset.values(*serializers.post_columns(fields)),
+        per_page=page_size(request),
+    )
+    return {
+        'results': [serializers.post(row, fields) for row in page_obj],
+        **links(request, page_obj),
+    }
+
+
+@api_view
+@versioned(index_scopes)
+def index(request):
+    fields = serializers.requested_fields(request, serializers.POST_FIELDS)
+    return respond(post_page(request, Post.objects.all(), fields))
+
+
+@api_view
+@versioned(group_scopes)
+def group_posts(request, slug):
+    fields = serializers.requested_fields(request, serializers.POST_FIELDS)
+    group = Group.objects.filter(slug=slug).values(
+        'id', 'slug', 'title', 'description'
+    ).first()
+    if group is None:
+        return not_found()
+    group['posts_count'] = counters.get(counters.GROUP_POSTS, group['id'])
+    data = post_page(request, Post.objects.filter(group_id=group['id']),
+                     fields)
+    return respond({'group': group, **data})
+
+
+@api_view
+@versioned(profile_scopes)
+def profile(request, username):
+    fields = serializers.requested_fields(request, serializers.POST_FIELDS)
+    author = User.objects.filter(username=username).values(
+        'id', 'username', 'first_name', 'last_name'
+    ).first()
+    if author is None:
+        return not_found()
+    pk = author['id']
+    counts = counters.get_many((
+        (counters.AUTHOR_POSTS, pk),
+        (counters.FOLLOWERS, pk),
+        (counters.FOLLOWING, pk),
+    ))
+    author.update(
+        posts_count=counts[(counters.AUTHOR_POSTS, pk)],
+        followers_count=counts[(counters.FOLLOWERS, pk)],
+        following_count=counts[(counters.FOLLOWING, pk)],
+    )
+    if request.user.is_authenticated:
+        author['following'] = Follow.objects.filter(
+            user=request.user, author_id=pk
+        ).exists()
+    data = post_page(request, Post.objects.filter(author_id=pk), fields)
+    return respond({'author': author, **data})
+
+
+@api_view
+@versioned(follow_scopes)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return respond({'detail': 'Нужно войти'}, 401)
+    fields = serializers.requested_fields(request, serializers.POST_FIELDS)
+    page_obj = paginate(
+        request,
+        TimelineEntry.objects.filter(user=request.user),
+        per_page=page_size(request),
+        ordering=('-pub_date', '-post_id'),
+        paginator_class=timeline.HybridTimelinePaginator,
+        user=request.user,
+    )
+    ids = [entry.post_id for entry in page_obj]
+    rows = {
+        row['id']: row
+        for row in Post.objects.filter(pk__in=ids).values(
+            *serializers.post_columns(fields)
+        )
+    }
+    return respond({
+        'results': [
+            serializers.post(rows[pk], fields) for pk in ids if pk in rows
+        ],
+        **links(request, page_obj),
+    })
+
+
+@api_view
+@versioned(post_detail_scopes)
+def post_detail(request, post_id):
+    fields = serializers.requested_fields(
+        request, serializers.POST_DETAIL_FIELDS
+    )
+    row = Post.objects.filter(pk=post_id).values(
+        *serializers.post_columns(fields)
+    ).first()
+    if row is None:
+        return not_found()
+    data = serializers.post(row, fields)
+    if 'comments_count' in fields:
+        data['comments_count'] = counters.get(
+            counters.POST_COMMENTS, post_id
+        )
+    return respond(data)
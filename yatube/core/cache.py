@@ -0,0 +1,235 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import timing
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite (WAL), общий для всех процессов на хосте.
+
+    LOCATION — путь к файлу. Размер ограничен OPTIONS['MAX_ENTRIES'];
+    при переполнении вытесняется доля CULL_FREQUENCY записей, к которым
+    дольше всего не обращались (LRU). Переполнение проверяется раз в
+    cull_every записей процесса, поэтому кэш может ненадолго превысить
+    MAX_ENTRIES. get_many, set_many и incr выполняются в одной
+    транзакции.
+    """
+
+    # Время доступа обновляется не чаще раза в секунду, чтобы чтение
+    # почти никогда не превращалось в запись.
+    touch_interval = 1.0
+    # Чистка — удаление истекших и подсчет записей — не на каждую запись.
+    cull_every = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self, write=False):
+        with timing.measure('cache'):
+            connection = self._connection()
+            connection.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        # BaseCache уже переводит timeout в момент истечения.
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _alive(expires, now):
+        return expires is None or expires > now
+
+    def _select(self, connection, keys):
+        rows = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows.update(
+                (key, (value, expires, accessed))
+                for key, value, expires, accessed in connection.execute(
+                    'SELECT key, value, expires, accessed FROM cache '
+                    'WHERE key IN ({})'.format(','.join('?' * len(chunk))),
+                    chunk,
+                )
+            )
+        return rows
+
+    def _write(self, connection, items, expires, now):
+        connection.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            [
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                 expires, now)
+                for key, value in items
+            ],
+        )
+
+    def _maybe_cull(self, connection, now):
+        self._writes += 1
+        if self._writes % self.cull_every == 0:
+            self._cull(connection, now)
+
+    def _cull(self, connection, now):
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,),
+        )
+        total = connection.execute('SELECT count(*) FROM cache').fetchone()[0]
+        if total <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (max(total // self._cull_frequency, total - self._max_entries),),
+        )
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        result, stale = {}, []
+        with self._transaction() as connection:
+            rows = self._select(connection, keys)
+        for key, (value, expires, accessed) in rows.items():
+            if not self._alive(expires, now):
+                continue
+            result[keys[key]] = pickle.loads(value)
+            if now - accessed > self.touch_interval:
+                stale.append(key)
+        timing.count('cache_hits', len(result))
+        timing.count('cache_misses', len(keys) - len(result))
+        if stale:
+            with self._transaction(write=True) as connection:
+                connection.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?',
+                    [(now, key) for key in stale],
+                )
+        return result
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = [(self._key(key, version), value)
+                 for key, value in data.items()]
+        if not items:
+            return []
+        now = time.time()
+        with self._transaction(write=True) as connection:
+            self._write(connection, items, self._expires(timeout), now)
+            self._maybe_cull(connection, now)
+        return []
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction(write=True) as connection:
+            row = self._select(connection, [key]).get(key)
+            if row is not None and self._alive(row[1], now):
+                return False
+            self._write(connection, [(key, value)],
+                        self._expires(timeout), now)
+            self._maybe_cull(connection, now)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction(write=True) as connection:
+            row = self._select(connection, [key]).get(key)
+            if row is None or not self._alive(row[1], now):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now, key),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction(write=True) as connection:
+            updated = connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self._expires(timeout), now, key, now),
+            ).rowcount
+        return bool(updated)
+
+    def has_key(self, key, version=None):
+        return key in self.get_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._transaction(write=True) as connection:
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?', [(key,) for key in keys]
+            )
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def clear(self):
+        with self._transaction(write=True) as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живет всё время работы процесса: открывать его на
+        # каждый запрос дороже, чем держать.
+        pass
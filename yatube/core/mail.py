@@ -0,0 +1,104 @@
+import base64
+from email import message_from_bytes
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from . import tasks
+
+
+def _encode(content):
+    if isinstance(content, str):
+        content = content.encode()
+    return base64.b64encode(content).decode()
+
+
+def _dump_attachment(attachment):
+    # Вложение — кортеж (имя, содержимое, тип) или готовая MIME-часть.
+    if isinstance(attachment, MIMEBase):
+        return {'mime': _encode(attachment.as_bytes())}
+    filename, content, mimetype = attachment
+    return [filename, _encode(content), mimetype]
+
+
+def _load_mime(raw):
+    parsed = message_from_bytes(base64.b64decode(raw))
+    part = MIMEBase(parsed.get_content_maintype(),
+                    parsed.get_content_subtype())
+    for header in part.keys():
+        del part[header]
+    for header, value in parsed.items():
+        part[header] = value
+    part.set_payload(parsed.get_payload())
+    return part
+
+
+def dump(message):
+    """Письмо в виде, пригодном для аргументов задачи (JSON)."""
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': [
+            _dump_attachment(attachment)
+            for attachment in message.attachments
+        ],
+    }
+
+
+def load(data):
+    data = dict(data)
+    attachments = data.pop('attachments')
+    alternatives = [tuple(item) for item in data.pop('alternatives')]
+    message = EmailMultiAlternatives(alternatives=alternatives, **data)
+    for attachment in attachments:
+        if isinstance(attachment, dict):
+            message.attach(_load_mime(attachment['mime']))
+        else:
+            filename, content, mimetype = attachment
+            message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+@tasks.task(batch=True)
+def deliver(batch):
+    """Отправляет пачку писем через одно соединение EMAIL_DELIVERY_BACKEND.
+
+    Письма отправляются по одному: упавшие повторяются отдельно, а уже
+    отправленные не уходят повторно.
+    """
+    failed, errors = [], []
+    with get_connection(settings.EMAIL_DELIVERY_BACKEND) as connection:
+        for index, (data,) in enumerate(batch):
+            try:
+                connection.send_messages([load(data)])
+            except Exception as error:
+                failed.append(index)
+                errors.append(f'{", ".join(data["to"])}: {error!r}')
+    if failed:
+        raise tasks.BatchError(failed, '\n'.join(errors))
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Почтовый бэкенд, который только ставит письма в очередь.
+
+    Письмо пишется в очередь задач, а отправляет его воркер run_tasks
+    пачками.
+    """
+
+    def send_messages(self, email_messages):
+        count = 0
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            deliver.delay(dump(message))
+            count += 1
+        return count
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.TASK_CONCURRENCY,
+            help='Сколько задач выполнять параллельно (потоков)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TASK_BATCH_SIZE,
+            help='Сколько задач воркер берет за раз',
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=settings.TASK_LEASE,
+            help='Через сколько секунд невыполненную задачу возьмет другой',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Выйти, когда очередь опустеет',
+        )
+
+    def handle(self, *args, **options):
+        tasks.work_in_threads(
+            max(options['concurrency'], 1),
+            options['batch_size'],
+            options['lease'],
+            burst=options['burst'],
+        )
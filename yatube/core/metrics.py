@@ -0,0 +1,310 @@
+"""Метрики процесса для Prometheus.
+
+Каждый процесс-воркер копит значения в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд записывает их целиком в свой файл
+``<pid>-<uuid>.json`` в METRICS_DIR: uuid отличает процесс, получивший
+PID завершившегося. При сборе (вид core.views.metrics) файлы
+завершившихся процессов складываются в общий ``merged.json`` и
+удаляются, поэтому счетчики не уменьшаются, а файлов не больше, чем
+живых процессов.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Границы корзин гистограммы времени ответа, в секундах.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+# Результат обращения к кэшу -> счетчик core.timing.
+CACHE_COUNTERS = {'hit': 'cache_hits', 'miss': 'cache_misses'}
+MERGED = 'merged.json'
+
+# Имя -> (тип, описание).
+FAMILIES = {
+    'yatube_http_requests_total': (
+        'counter', 'Ответы по виду и коду статуса.'
+    ),
+    'yatube_http_request_duration_seconds': (
+        'histogram', 'Время ответа по виду.'
+    ),
+    'yatube_http_request_queries': (
+        'histogram', 'Число SQL-запросов на ответ по виду.'
+    ),
+    'yatube_db_query_duration_seconds_total': (
+        'counter', 'Суммарное время SQL-запросов по виду.'
+    ),
+    'yatube_cache_requests_total': (
+        'counter', 'Обращения к кэшу из запросов: hit или miss.'
+    ),
+    'yatube_task_queue_depth': (
+        'gauge', 'Фоновые задачи в очереди по имени и статусу.'
+    ),
+}
+
+
+def _write(path, data):
+    """Атомарно записывает JSON: читатель видит старый или новый файл."""
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix='.tmp'
+    )
+    with os.fdopen(descriptor, 'w') as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+def _read(path, default):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def _add(values, rows):
+    for name, labels, value in rows:
+        values[name, tuple(map(tuple, labels))] += value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """Значения метрик одного процесса с записью в файл-шард."""
+
+    def __init__(self, directory, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # (имя, ((метка, значение), ...)) -> значение.
+        self._values = defaultdict(float)
+        self._pid = os.getpid()
+        self._token = uuid.uuid4().hex
+        self._flushed = time.monotonic()
+
+    def _check_pid(self):
+        # После fork потомок начинает с нуля и с новым шардом: значения
+        # родителя уже лежат в шарде родителя.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            self._check_pid()
+            self._values[name, tuple(labels)] += value
+        self._maybe_flush()
+
+    def observe(self, name, value, buckets, labels=()):
+        """Наблюдение гистограммы; корзины хранятся накопленными."""
+        labels = tuple(labels)
+        with self._lock:
+            self._check_pid()
+            for bound in buckets:
+                if value <= bound:
+                    self._values[
+                        f'{name}_bucket', labels + (('le', str(bound)),)
+                    ] += 1
+            self._values[f'{name}_bucket', labels + (('le', '+Inf'),)] += 1
+            self._values[f'{name}_sum', labels] += value
+            self._values[f'{name}_count', labels] += 1
+        self._maybe_flush()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f'{self._pid}-{self._token}.json')
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Атомарно перезаписывает шард процесса."""
+        with self._lock:
+            self._check_pid()
+            data = [
+                [name, labels, value]
+                for (name, labels), value in self._values.items()
+            ]
+            path = self.path
+            self._flushed = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        _write(path, data)
+
+    @contextmanager
+    def _merge_lock(self):
+        with open(os.path.join(self.directory, 'merge.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _shards(self):
+        """{путь: (pid, mtime)} шардов процессов, кроме merged.json."""
+        shards = {}
+        for path in glob.glob(os.path.join(self.directory, '*-*.json')):
+            try:
+                pid = int(os.path.basename(path).split('-', 1)[0])
+                shards[path] = (pid, os.path.getmtime(path))
+            except (OSError, ValueError):
+                continue
+        return shards
+
+    def _dead(self, shards):
+        # Из шардов с одним PID живым может быть только самый свежий:
+        # остальные оставили процессы, чей PID потом достался другому.
+        newest = {}
+        for path, (pid, mtime) in shards.items():
+            if pid not in newest or mtime > shards[newest[pid]][1]:
+                newest[pid] = path
+        return [
+            path for path, (pid, _) in shards.items()
+            if path != self.path
+            and (newest[pid] != path or not _pid_alive(pid))
+        ]
+
+    def _fold(self, shards):
+        """Переносит шарды завершившихся процессов в merged.json."""
+        merged_path = os.path.join(self.directory, MERGED)
+        merged = _read(merged_path, {'values': [], 'folded': []})
+        # Шарды, которые прошлый перенос уже учел, но не успел удалить.
+        for name in merged['folded']:
+            path = os.path.join(self.directory, name)
+            shards.pop(path, None)
+            if os.path.exists(path):
+                os.remove(path)
+        dead = self._dead(shards)
+        if not dead:
+            return
+        values = defaultdict(float)
+        _add(values, merged['values'])
+        for path in dead:
+            _add(values, _read(path, []))
+        _write(merged_path, {
+            'values': [
+                [name, labels, value]
+                for (name, labels), value in values.items()
+            ],
+            'folded': [os.path.basename(path) for path in dead],
+        })
+        for path in dead:
+            os.remove(path)
+            del shards[path]
+
+    def collect(self):
+        """Сумма значений всех процессов: {(имя, метки): значение}."""
+        self.flush()
+        values = defaultdict(float)
+        with self._merge_lock():
+            shards = self._shards()
+            self._fold(shards)
+            merged = _read(os.path.join(self.directory, MERGED), {})
+            _add(values, merged.get('values', []))
+            for path in shards:
+                _add(values, _read(path, []))
+        return values
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def registry():
+    """Реестр процесса для текущего METRICS_DIR."""
+    directory = settings.METRICS_DIR
+    with _registries_lock:
+        if directory not in _registries:
+            _registries[directory] = Registry(
+                directory, settings.METRICS_FLUSH_INTERVAL
+            )
+            atexit.register(_registries[directory].flush)
+        return _registries[directory]
+
+
+def observe_response(view, status, seconds, timings):
+    """Записывает замеры ответа (core.timing.Timings) в реестр."""
+    metrics = registry()
+    labels = (('view', view),)
+    metrics.inc(
+        'yatube_http_requests_total', labels + (('status', str(status)),)
+    )
+    metrics.observe(
+        'yatube_http_request_duration_seconds', seconds, LATENCY_BUCKETS,
+        labels,
+    )
+    metrics.observe(
+        'yatube_http_request_queries', timings.counts.get('sql', 0),
+        QUERY_BUCKETS, labels,
+    )
+    metrics.inc(
+        'yatube_db_query_duration_seconds_total', labels,
+        timings.durations['sql'],
+    )
+    for result in ('hit', 'miss'):
+        count = timings.counts.get(CACHE_COUNTERS[result], 0)
+        if count:
+            metrics.inc(
+                'yatube_cache_requests_total', (('result', result),), count
+            )
+
+
+def _family(name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+            return name[:-len(suffix)]
+    return name
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render(values):
+    """Текстовый формат Prometheus для {(имя, метки): значение}."""
+    by_family = defaultdict(list)
+    for (name, labels), value in values.items():
+        by_family[_family(name)].append((name, labels, value))
+    lines = []
+    for family in sorted(by_family):
+        kind, description = FAMILIES.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {description}')
+        lines.append(f'# TYPE {family} {kind}')
+        for name, labels, value in sorted(
+            by_family[family], key=_sample_order
+        ):
+            label_text = ','.join(
+                f'{key}="{_escape(label)}"' for key, label in labels
+            )
+            if label_text:
+                label_text = f'{{{label_text}}}'
+            lines.append(f'{name}{label_text} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _sample_order(sample):
+    # Образцы одного набора меток идут подряд, корзины гистограммы —
+    # по возрастанию границы (float('+Inf') — бесконечность).
+    name, labels, _ = sample
+    plain = [item for item in labels if item[0] != 'le']
+    return plain, name, float(dict(labels).get('le', 0))
@@ -0,0 +1,44 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Фоновая задача в очереди; выполненные задачи удаляются."""
+    PENDING = 'pending'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    args = models.TextField('Аргументы (JSON)', default='[]')
+    key = models.CharField(
+        'Ключ для схлопывания одинаковых задач', max_length=200, blank=True
+    )
+    status = models.CharField(
+        'Статус', max_length=16, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    run_at = models.DateTimeField('Выполнить не раньше', default=timezone.now)
+    locked_by = models.CharField('Взята воркером', max_length=32, blank=True)
+    locked_until = models.DateTimeField(
+        'Взята до', null=True, blank=True
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=('status', 'run_at'),
+                name='task_status_run_at_idx'
+            ),
+            models.Index(fields=('locked_by',), name='task_locked_by_idx'),
+            models.Index(fields=('key',), name='task_key_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,210 @@
+import json
+import logging
+import threading
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class BatchError(Exception):
+    """Пакетная задача выполнилась не для всех вызовов пачки.
+
+    failed — индексы упавших вызовов в списке аргументов. Остальные
+    задачи пачки считаются выполненными, повторяются только упавшие.
+    """
+
+    def __init__(self, failed, message=''):
+        super().__init__(message)
+        self.failed = list(failed)
+
+
+def task(func=None, *, batch=False):
+    """Регистрирует функцию как фоновую задачу.
+
+    Задача ставится в очередь вызовом func.delay(*args, key='') или
+    сразу пачкой вызовов func.delay_many([(args, key), ...]). Запись
+    идет в текущее соединение: внутри transaction.atomic() воркер увидит
+    задачу только после коммита, иначе — сразу. Аргументы должны
+    сериализоваться в JSON. Непустой key схлопывает одинаковые задачи,
+    пока первая ждет выполнения или уже упала после всех попыток
+    (такую перезапускают вручную).
+
+    Функция с batch=True получает список аргументов всех задач пачки
+    (список списков) и выполняется за них один раз. Если часть вызовов
+    не удалась, она бросает BatchError с их индексами.
+    """
+    def register(func):
+        name = f'{func.__module__}.{func.__name__}'
+        func.task_name = name
+        func.batch = batch
+        func.delay = lambda *args, key='': enqueue(name, args, key)
+        func.delay_many = lambda calls: enqueue_many(name, calls)
+        _registry[name] = func
+        return func
+    return register(func) if func else register
+
+
+def enqueue(name, args, key=''):
+    enqueue_many(name, [(args, key)])
+
+
+def enqueue_many(name, calls):
+    """Ставит в очередь вызовы (args, key) одной задачи двумя запросами."""
+    if settings.TASKS_EAGER:
+        _call(_registry[name], [list(args) for args, _ in calls])
+        return
+    keys = {key for _, key in calls if key}
+    # Упавшие задачи тоже держат ключ, иначе каждая постановка
+    # создавала бы новую обреченную задачу.
+    pending = set(
+        Task.objects.filter(key__in=keys).values_list('key', flat=True)
+    ) if keys else set()
+    new = []
+    for args, key in calls:
+        if key in pending:
+            continue
+        if key:
+            pending.add(key)
+        new.append(Task(name=name, args=json.dumps(list(args)), key=key))
+    Task.objects.bulk_create(new)
+
+
+def _resolve(name):
+    if name not in _registry:
+        # Модули с задачами могли еще не импортироваться в этом процессе.
+        import_module(name.rsplit('.', 1)[0])
+    return _registry[name]
+
+
+def _call(func, args_list):
+    if func.batch:
+        func(args_list)
+    else:
+        for args in args_list:
+            func(*args)
+
+
+def claim(limit, lease):
+    """Берет до limit готовых задач под аренду на lease секунд."""
+    now = timezone.now()
+    ready = Task.objects.filter(status=Task.PENDING, run_at__lte=now).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    )
+    ids = list(
+        ready.order_by('run_at', 'pk').values_list('pk', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Условия повторяются в UPDATE: задачу, которую успел взять другой
+    # воркер, этот уже не получит.
+    ready.filter(pk__in=ids).update(
+        locked_by=token, locked_until=now + timedelta(seconds=lease)
+    )
+    return list(Task.objects.filter(locked_by=token).order_by('pk'))
+
+
+def _retry(tasks, error):
+    now = timezone.now()
+    for item in tasks:
+        item.attempts += 1
+        item.last_error = error
+        item.locked_by, item.locked_until = '', None
+        if item.attempts >= settings.TASK_MAX_ATTEMPTS:
+            item.status = Task.FAILED
+        else:
+            item.run_at = now + timedelta(
+                seconds=settings.TASK_RETRY_DELAY * 2 ** (item.attempts - 1)
+            )
+    Task.objects.bulk_update(
+        tasks,
+        ('attempts', 'last_error', 'locked_by', 'locked_until', 'status',
+         'run_at'),
+    )
+
+
+def run(tasks):
+    """Выполняет взятые задачи; упавшие откладывает с ростом паузы."""
+    groups = defaultdict(list)
+    for item in tasks:
+        groups[item.name].append(item)
+    for name, items in groups.items():
+        try:
+            func = _resolve(name)
+        except (ImportError, KeyError):
+            _retry(items, f'Неизвестная задача {name}')
+            continue
+        chunks = [items] if func.batch else [[item] for item in items]
+        for chunk in chunks:
+            _run_chunk(name, func, chunk)
+
+
+def _run_chunk(name, func, chunk):
+    failed, error = [], ''
+    try:
+        with transaction.atomic():
+            try:
+                _call(func, [json.loads(item.args) for item in chunk])
+            except BatchError as batch_error:
+                failed = [chunk[index] for index in batch_error.failed]
+                error = str(batch_error)
+            Task.objects.filter(
+                pk__in=[item.pk for item in chunk if item not in failed]
+            ).delete()
+    except Exception:
+        failed, error = chunk, traceback.format_exc()
+    if failed:
+        logger.error('Задача %s упала: %s', name, error)
+        _retry(failed, error)
+
+
+def work(batch_size, lease, stop, burst=False, poll=1.0):
+    """Цикл одного воркера: брать и выполнять задачи до stop."""
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            tasks = claim(batch_size, lease)
+            if tasks:
+                run(tasks)
+            elif burst:
+                return
+            else:
+                stop.wait(poll)
+    finally:
+        connection.close()
+
+
+def work_in_threads(concurrency, batch_size, lease, burst=False, poll=1.0):
+    """Запускает concurrency воркеров в потоках; Ctrl+C их останавливает."""
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=work,
+            args=(batch_size, lease, stop, burst, poll),
+            name=f'tasks-{number}',
+        )
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
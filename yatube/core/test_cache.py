@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+def increment_many(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('hits')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertTrue(self.cache.add('other', 2))
+        self.assertEqual(
+            self.cache.get_many(['key', 'other', 'missing']),
+            {'key': {'value': 1}, 'other': 2}
+        )
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.incr('a', 10), 11)
+        self.assertEqual(self.cache.decr('b'), 1)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_expiry(self):
+        self.cache.set('short', 1, timeout=0.01)
+        self.cache.set('forever', 1, timeout=None)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 2))
+        self.assertEqual(self.cache.get('forever'), 1)
+
+    def test_shared_between_instances(self):
+        """Другой процесс видит те же данные через тот же файл"""
+        other = SQLiteCache(self.path, {})
+        self.cache.set('shared', 'value')
+        self.assertEqual(other.get('shared'), 'value')
+        other.delete('shared')
+        self.assertIsNone(self.cache.get('shared'))
+
+    def test_lru_eviction(self):
+        cache = SQLiteCache(
+            self.path, {'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 4}}
+        )
+        cache.touch_interval = 0
+        cache.cull_every = 1
+        for key in 'abcd':
+            cache.set(key, key)
+            time.sleep(0.01)
+        cache.get('a')
+        cache.set('e', 'e')
+        self.assertEqual(
+            sorted(cache.get_many('abcde')), ['a', 'c', 'd', 'e'])
+
+    def test_cull_every(self):
+        """Переполнение проверяется раз в cull_every записей"""
+        cache = SQLiteCache(
+            self.path, {'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 2}}
+        )
+        cache.cull_every = 3
+        cache.set_many({'a': 1, 'b': 2})
+        cache.set('c', 3)
+        self.assertEqual(len(cache.get_many('abc')), 3)
+        cache.add('d', 4)
+        self.assertEqual(len(cache.get_many('abcd')), 2)
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('hits', 0)
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(target=increment_many, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('hits'), 200)
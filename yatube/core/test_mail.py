@@ -0,0 +1,110 @@
+from email.mime.text import MIMEText
+from smtplib import SMTPException
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+User = get_user_model()
+
+
+class FlakyBackend(EmailBackend):
+    """Не может доставить письма на bad@example.com."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if 'bad@example.com' in message.recipients():
+                raise SMTPException('Отказ сервера')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.OutboxBackend',
+    EMAIL_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    TASKS_EAGER=False,
+)
+class OutboxBackendTest(TestCase):
+    def test_password_reset_mail_queued(self):
+        """Письмо сброса пароля ставится в очередь, а не отправляется"""
+        User.objects.create_user(
+            'reader', email='reader@example.com', password='secret-pass'
+        )
+        response = self.client.post(
+            reverse('users:password_reset'), {'email': 'reader@example.com'}
+        )
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Task.objects.count(), 1)
+        tasks.run(tasks.claim(10, 60))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+        self.assertIn('/reset/', mail.outbox[0].body)
+
+    def test_messages_sent_in_one_connection(self):
+        """Пачка писем отправляется через одно соединение"""
+        message = EmailMultiAlternatives(
+            'Тема', 'Текст', 'from@example.com', ['to@example.com']
+        )
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.attach('file.txt', 'вложение', 'text/plain')
+        for _ in range(3):
+            message.send()
+        with mock.patch(
+            'core.mail.get_connection', wraps=get_connection
+        ) as connect:
+            tasks.run(tasks.claim(10, 60))
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        sent = mail.outbox[0]
+        self.assertEqual(sent.subject, 'Тема')
+        self.assertEqual(sent.alternatives, [('<p>Текст</p>', 'text/html')])
+        self.assertEqual(
+            sent.attachments, [('file.txt', 'вложение', 'text/plain')]
+        )
+
+    @override_settings(EMAIL_DELIVERY_BACKEND='core.test_mail.FlakyBackend')
+    def test_only_failed_messages_retried(self):
+        """Ошибка одного письма не отправляет повторно остальные"""
+        for recipient in ('one@example.com', 'bad@example.com',
+                          'two@example.com'):
+            mail.send_mail('Тема', 'Текст', 'from@example.com', [recipient])
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run(tasks.claim(10, 60))
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [['one@example.com'], ['two@example.com']],
+        )
+        task = Task.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('bad@example.com', task.last_error)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run(tasks.claim(10, 60))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_mime_attachment(self):
+        """Готовая MIME-часть переживает очередь"""
+        message = EmailMultiAlternatives(
+            'Тема', 'Текст', 'from@example.com', ['to@example.com']
+        )
+        part = MIMEText('отчет', 'csv', 'utf-8')
+        part.add_header('Content-Disposition', 'attachment',
+                        filename='report.csv')
+        message.attach(part)
+        message.send()
+        tasks.run(tasks.claim(10, 60))
+        sent = mail.outbox[0].attachments[0]
+        self.assertEqual(sent.get_content_type(), 'text/csv')
+        self.assertEqual(sent.get_filename(), 'report.csv')
+        self.assertEqual(
+            sent.get_payload(decode=True).decode('utf-8'), 'отчет'
+        )
+        self.assertIn('report.csv', mail.outbox[0].message().as_string())
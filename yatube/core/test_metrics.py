@@ -0,0 +1,81 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core import metrics
+
+
+def count_requests(directory, times):
+    registry = metrics.Registry(directory)
+    for _ in range(times):
+        registry.inc('yatube_http_requests_total', (('view', 'worker'),))
+    registry.flush()
+
+
+class RegistryTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.registry = metrics.Registry(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_processes_merged_on_collect(self):
+        """Сбор складывает шарды всех процессов"""
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(target=count_requests,
+                            args=(self.directory, 25))
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.registry.inc('yatube_http_requests_total', (('view', 'worker'),))
+        key = 'yatube_http_requests_total', (('view', 'worker'),)
+        self.assertEqual(self.registry.collect()[key], 76)
+        # Шарды завершившихся процессов сложены в один файл.
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.directory)
+                   if name.endswith('.json')),
+            sorted([metrics.MERGED, os.path.basename(self.registry.path)]),
+        )
+        self.assertEqual(self.registry.collect()[key], 76)
+
+    def test_reused_pid_keeps_counts(self):
+        """Новый процесс с PID завершившегося не затирает его счетчики"""
+        key = 'yatube_http_requests_total', (('view', 'worker'),)
+        old_shard = os.path.join(self.directory, f'{os.getpid()}-old.json')
+        with open(old_shard, 'w') as file:
+            json.dump([[*key, 10]], file)
+        os.utime(old_shard, (0, 0))
+        self.registry.inc(*key)
+        self.assertEqual(self.registry.collect()[key], 11)
+        self.assertFalse(os.path.exists(old_shard))
+        self.registry.inc(*key)
+        self.assertEqual(self.registry.collect()[key], 12)
+
+    def test_histogram_rendering(self):
+        """Гистограмма выводится накопленными корзинами по порядку"""
+        for seconds in (0.003, 0.2, 20):
+            self.registry.observe(
+                'yatube_http_request_duration_seconds', seconds,
+                (0.01, 0.5), (('view', 'posts:index_list'),),
+            )
+        text = metrics.render(self.registry.collect())
+        prefix = 'yatube_http_request_duration_seconds'
+        labels = 'view="posts:index_list"'
+        self.assertIn(
+            f'# TYPE {prefix} histogram\n'
+            f'{prefix}_bucket{{{labels},le="0.01"}} 1\n'
+            f'{prefix}_bucket{{{labels},le="0.5"}} 2\n'
+            f'{prefix}_bucket{{{labels},le="+Inf"}} 3\n'
+            f'{prefix}_count{{{labels}}} 3\n'
+            f'{prefix}_sum{{{labels}}} 20.203\n',
+            text,
+        )
@@ -0,0 +1,99 @@
+import json
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+calls = []
+
+
+@tasks.task
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(batch=True)
+def record_batch(batch):
+    calls.append(sorted(value for (value,) in batch))
+
+
+@tasks.task
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(TASKS_EAGER=False, TASK_MAX_ATTEMPTS=2,
+                   TASK_RETRY_DELAY=10)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_enqueues_and_run_deletes(self):
+        """delay пишет задачу в очередь, воркер выполняет и удаляет ее"""
+        record.delay(1)
+        record.delay(2)
+        task = Task.objects.order_by('pk').first()
+        self.assertEqual(task.name, 'core.test_tasks.record')
+        self.assertEqual(json.loads(task.args), [1])
+        self.assertEqual(calls, [])
+        tasks.run(tasks.claim(10, 60))
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(Task.objects.exists())
+
+    def test_key_collapses_pending_tasks(self):
+        """Задачи с одинаковым ключом не дублируются"""
+        record.delay(1, key='same')
+        record.delay(1, key='same')
+        record.delay(1, key='other')
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_key_held_by_failed_task(self):
+        """Упавшая задача не дает поставить ту же задачу заново"""
+        record.delay(1, key='same')
+        Task.objects.update(status=Task.FAILED)
+        record.delay(1, key='same')
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_batch_task_called_once(self):
+        """Пакетная задача получает аргументы всей пачки"""
+        for value in (3, 1, 2):
+            record_batch.delay(value)
+        tasks.run(tasks.claim(10, 60))
+        self.assertEqual(calls, [[1, 2, 3]])
+
+    def test_claimed_tasks_not_taken_twice(self):
+        """Взятую задачу не получит другой воркер, пока не истечет аренда"""
+        record.delay(1)
+        self.assertEqual(len(tasks.claim(10, 60)), 1)
+        self.assertEqual(tasks.claim(10, 60), [])
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        self.assertEqual(len(tasks.claim(10, 60)), 1)
+
+    def test_failed_task_retried_then_marked_failed(self):
+        """Упавшая задача откладывается, а после лимита попыток помечается"""
+        explode.delay()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run(tasks.claim(10, 60))
+        task = Task.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertIn('boom', task.last_error)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertEqual(tasks.claim(10, 60), [])
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run(tasks.claim(10, 60))
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(tasks.claim(10, 60), [])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        """В режиме TASKS_EAGER задача выполняется сразу"""
+        record.delay(5)
+        record_batch.delay(6)
+        self.assertEqual(calls, [5, [6]])
+        self.assertFalse(Task.objects.exists())
@@ -0,0 +1,64 @@
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from core import timing
+from posts.models import Post
+
+User = get_user_model()
+
+
+def metrics(header):
+    """Server-Timing -> {имя: (миллисекунды, описание)}."""
+    return {
+        name: (float(duration), description)
+        for name, duration, description in re.findall(
+            r'(\w+);dur=([\d.]+);desc="([^"]*)"', header
+        )
+    }
+
+
+class TimingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='timing_author')
+        Post.objects.create(author=author, text='Пост')
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_and_log(self):
+        """Ответ получает Server-Timing, а лог — строку JSON по виду"""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            response = Client().get('/')
+        found = metrics(response['Server-Timing'])
+        self.assertEqual(
+            list(found), ['sql', 'tpl', 'cache', 'thumb', 'total']
+        )
+        self.assertGreater(found['tpl'][0], 0)
+        self.assertLessEqual(found['tpl'][0], found['total'][0])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index_list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql'], 0)
+        self.assertIn(f'SQL, {record["sql"]} queries', found['sql'][1])
+        self.assertGreater(record['cache_misses'], 0)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_cache_hits_counted(self):
+        """Повторный запрос берет страницу из кэша"""
+        client = Client()
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            client.get('/')
+            client.get('/')
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertGreater(record['cache_hits'], 0)
+
+    def test_disabled(self):
+        """Выключенные замеры не добавляют заголовок"""
+        response = Client().get('/')
+        self.assertNotIn('Server-Timing', response)
+        with timing.measure('sql'):
+            timing.count('sql')
+        self.assertIsNone(timing.current())
@@ -0,0 +1,34 @@
+import os
+
+from django.core.files.uploadhandler import StopUpload
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.uploads import StreamingUploadHandler, too_large_uploads
+
+
+@override_settings(FILE_UPLOAD_MAX_SIZE=10)
+class StreamingUploadHandlerTest(SimpleTestCase):
+    def receive(self, *chunks):
+        self.request = RequestFactory().post('/')
+        handler = StreamingUploadHandler(self.request)
+        handler.new_file('image', 'picture.png', 'image/png', None)
+        start = 0
+        for chunk in chunks:
+            handler.receive_data_chunk(chunk, start)
+            start += len(chunk)
+        return handler.file_complete(start)
+
+    def test_writes_to_disk(self):
+        """Загрузка пишется во временный файл на диске"""
+        uploaded = self.receive(b'abc', b'def')
+        self.addCleanup(uploaded.close)
+        self.assertTrue(os.path.exists(uploaded.temporary_file_path()))
+        self.assertEqual(uploaded.read(), b'abcdef')
+        self.assertEqual(uploaded.size, 6)
+
+    def test_stops_upload_over_limit(self):
+        """Файл сверх лимита прерывает разбор без дочитывания тела"""
+        with self.assertRaises(StopUpload) as caught:
+            self.receive(b'abcdef', b'ghijkl')
+        self.assertTrue(caught.exception.connection_reset)
+        self.assertEqual(too_large_uploads(self.request), ['image'])
@@ -1,6 +1,14 @@
+import shutil
+import tempfile
 from http import HTTPStatus
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from core.models import Task
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -12,3 +20,64 @@ class ViewTestClass(TestCase):
     def test_page_correct_template(self):
         response = self.client.get('handler404')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class MetricsViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(
+            METRICS=True, METRICS_DIR=self.directory,
+            METRICS_TOKEN='secret',
+        )
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_protected(self):
+        """/metrics закрыт для анонимов и открыт по токену и персоналу"""
+        client = Client()
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        response = client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer wrong'
+        )
+        self.assertEqual(response.status_code, 403)
+        response = client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        client.force_login(staff)
+        self.assertEqual(client.get('/metrics').status_code, 200)
+
+    def test_requests_and_queue(self):
+        """Ответы, запросы к БД, кэш и очередь задач попадают в метрики"""
+        client = Client()
+        client.get('/')
+        client.get('/')
+        client.get('/missing-page/')
+        Task.objects.create(name='posts.thumbnails.generate')
+        text = client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret'
+        ).content.decode()
+        self.assertIn(
+            'yatube_http_requests_total{view="posts:index_list",status="200"}'
+            ' 2\n',
+            text,
+        )
+        self.assertIn(
+            'yatube_http_requests_total{view="unmatched",status="404"} 1\n',
+            text,
+        )
+        self.assertIn(
+            'yatube_http_request_queries_count{view="posts:index_list"} 2\n',
+            text,
+        )
+        self.assertIn('yatube_cache_requests_total{result="hit"}', text)
+        self.assertIn(
+            'yatube_task_queue_depth{name="posts.thumbnails.generate",'
+            'status="pending"} 1\n',
+            text,
+        )
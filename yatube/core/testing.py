@@ -0,0 +1,44 @@
+"""Настройки тестов поверх yatube.settings.
+
+manage.py test включает их через TEST_RUNNER, pytest — через
+tests/conftest.py: фоновые задачи выполняются сразу, замеры и метрики
+выключены, у кэша свой файл.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def test_settings():
+    caches = {
+        alias: {**config, 'LOCATION': os.path.join(
+            tempfile.gettempdir(), 'yatube', f'test-{alias}-cache.sqlite3'
+        )}
+        for alias, config in settings.CACHES.items()
+    }
+    return {
+        'TASKS_EAGER': True,
+        'SERVER_TIMING': False,
+        'METRICS': False,
+        'CACHES': caches,
+    }
+
+
+def override():
+    return override_settings(**test_settings())
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner с настройками test_settings()."""
+
+    def setup_test_environment(self, **kwargs):
+        self._override = override()
+        self._override.enable()
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self._override.disable()
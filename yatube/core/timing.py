@@ -0,0 +1,188 @@
+"""Замеры времени запроса: SQL, шаблоны, кэш и миниатюры.
+
+TimingMiddleware собирает замеры текущего запроса и отдает их в
+заголовке Server-Timing, строкой JSON в логгер ``core.timing`` и в
+метрики core.metrics.
+Места, которые стоит замерять, вызывают measure() и count(); вне
+запроса и при выключенных замерах они почти ничего не стоят.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends import django as django_backend
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Виды работы в порядке вывода в Server-Timing.
+METRICS = ('sql', 'tpl', 'cache', 'thumb')
+
+_local = threading.local()
+
+
+class Timings:
+    """Замеры одного запроса: время по видам работы и счетчики."""
+
+    def __init__(self):
+        self.durations = dict.fromkeys(METRICS, 0.0)
+        self.counts = {}
+        self._active = set()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    @contextmanager
+    def measure(self, name):
+        # Вложенный замер того же вида (например, миниатюры, созданные
+        # сразу при постановке в очередь) не считается второй раз.
+        if name in self._active:
+            yield
+            return
+        self._active.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+            self._active.discard(name)
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка connection.execute_wrapper: время и число запросов."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('sql', time.perf_counter() - start)
+            self.count('sql')
+
+    def header(self, total):
+        """Значение Server-Timing; в описаниях — только latin-1."""
+        counts = self.counts
+        descriptions = {
+            'sql': f'SQL, {counts.get("sql", 0)} queries',
+            'tpl': 'Templates',
+            'cache': f'Cache, {counts.get("cache_hits", 0)} hits, '
+                     f'{counts.get("cache_misses", 0)} misses',
+            'thumb': f'Thumbnails, {counts.get("thumbnails", 0)} images, '
+                     f'{counts.get("thumbnails_missing", 0)} missing',
+        }
+        parts = [
+            self._metric(name, self.durations[name], descriptions[name])
+            for name in METRICS
+        ]
+        parts.append(self._metric('total', total, 'Total'))
+        return ', '.join(parts)
+
+    @staticmethod
+    def _metric(name, seconds, description):
+        return f'{name};dur={seconds * 1000:.1f};desc="{description}"'
+
+    def record(self, total):
+        """Словарь для строки лога: миллисекунды и счетчики."""
+        return {
+            'total_ms': round(total * 1000, 1),
+            **{
+                f'{name}_ms': round(seconds * 1000, 1)
+                for name, seconds in self.durations.items()
+            },
+            **self.counts,
+        }
+
+
+def current():
+    """Замеры текущего запроса или None."""
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def measure(name):
+    timings = current()
+    if timings is None:
+        yield
+        return
+    with timings.measure(name):
+        yield
+
+
+def count(name, value=1):
+    timings = current()
+    if timings is not None:
+        timings.count(name, value)
+
+
+class TimingMiddleware:
+    """Замеры каждого ответа: Server-Timing, строка лога и метрики.
+
+    Заголовок и лог включает SERVER_TIMING, запись в core.metrics —
+    METRICS. Если выключено и то и другое, middleware не участвует в
+    обработке запросов вовсе. Ставится первой в MIDDLEWARE, чтобы
+    замерять и запросы остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        self.server_timing = getattr(settings, 'SERVER_TIMING', False)
+        self.metrics = getattr(settings, 'METRICS', False)
+        if not (self.server_timing or self.metrics):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = _local.timings = Timings()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        total = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if self.metrics:
+            metrics.observe_response(
+                view, response.status_code, total, timings
+            )
+        if self.server_timing:
+            response['Server-Timing'] = timings.header(total)
+            logger.info(json.dumps({
+                'view': view,
+                'method': request.method,
+                'status': response.status_code,
+                **timings.record(total),
+            }))
+        return response
+
+
+class Template(django_backend.Template):
+    """Шаблон Django, время отрисовки которого попадает в замеры."""
+
+    def render(self, context=None, request=None):
+        with measure('tpl'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов Django с замером времени отрисовки.
+
+    Замеряются только шаблоны, которые отрисовывает вид; {% include %}
+    входит во время внешнего шаблона.
+    """
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """Пишет загружаемый файл на диск кусками, не копя его в памяти.
+
+    На файле больше FILE_UPLOAD_MAX_SIZE разбор запроса прерывается без
+    дочитывания тела, а имя поля попадает в request.too_large_uploads:
+    файла в request.FILES не будет, и форма должна отклонить запрос.
+    """
+
+    chunk_size = 64 * 2 ** 10
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra,
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.FILE_UPLOAD_MAX_SIZE:
+            if self.request is not None:
+                self.request.too_large_uploads = too_large_uploads(
+                    self.request
+                ) + [self.field_name]
+            raise StopUpload(connection_reset=True)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+def too_large_uploads(request):
+    """Поля, файлы которых StreamingUploadHandler отверг по размеру."""
+    return getattr(request, 'too_large_uploads', [])
@@ -1,5 +1,13 @@
+import hmac
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 
+from . import metrics as metrics_registry
+from .models import Task
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +23,27 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики всех процессов в текстовом формате Prometheus.
+
+    Доступны персоналу и по заголовку Authorization: Bearer <токен>
+    с токеном из METRICS_TOKEN.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = request.user.is_staff or token and hmac.compare_digest(
+        authorization.encode(), f'Bearer {token}'.encode()
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    values = metrics_registry.registry().collect()
+    queue = Task.objects.values('name', 'status').annotate(count=Count('id'))
+    for row in queue:
+        labels = (('name', row['name']), ('status', row['status']))
+        values['yatube_task_queue_depth', labels] = row['count']
+    return HttpResponse(
+        metrics_registry.render(values),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
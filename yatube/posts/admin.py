@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from . import search
+from .models import Comment, Counter, Follow, Group, Post
 
 
 @admin.register(Post)
@@ -11,6 +12,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        use_fts = search.match_expression(search_term) and search.fts_enabled()
+        if not use_fts:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=search.matching_ids(search_term)), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -31,3 +38,10 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
     list_filter = ('author',)
     search_fields = ('author', 'user')
+
+
+@admin.register(Counter)
+class CounterAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'object_id', 'value')
+    list_filter = ('name',)
+    search_fields = ('name',)
@@ -0,0 +1,150 @@
+import os
+import time
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def walk(directory, min_age):
+    """Файлы каталога хранилища (имя, байты), старше min_age секунд.
+
+    Обходит дерево через os.scandir, не собирая списки каталогов в
+    памяти целиком.
+    """
+    root = default_storage.path('')
+    deadline = time.time() - min_age
+    stack = [os.path.join(root, directory)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime <= deadline:
+                    name = os.path.relpath(entry.path, root)
+                    yield name.replace(os.sep, '/'), stat.st_size
+
+
+def orphan_images(min_age, batch_size):
+    """Пачки картинок из posts/, на которые не ссылается ни один пост."""
+    upload_to = Post._meta.get_field('image').upload_to
+    for batch in chunked(walk(upload_to, min_age), batch_size):
+        names = dict(batch)
+        used = set(
+            Post.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        )
+        orphans = [(name, size) for name, size in batch if name not in used]
+        if orphans:
+            yield orphans
+
+
+def unregistered_thumbnails(min_age, batch_size):
+    """Пачки миниатюр, которых нет в хранилище ключей sorl."""
+    prefix = thumbnail_settings.THUMBNAIL_PREFIX
+    for batch in chunked(walk(prefix, min_age), batch_size):
+        keys = {
+            add_prefix(ImageFile(name, default.storage).key): (name, size)
+            for name, size in batch
+        }
+        known = set(
+            KVStoreModel.objects.filter(key__in=keys).values_list(
+                'key', flat=True
+            )
+        )
+        stale = [item for key, item in keys.items() if key not in known]
+        if stale:
+            yield stale
+
+
+def orphan_sources(batch_size):
+    """Пачки исходников в хранилище ключей sorl без постов.
+
+    Это картинки, файл которых уже удален или перенесен, а миниатюры
+    остались.
+    """
+    keys = KVStoreModel.objects.filter(
+        key__startswith=add_prefix('', 'thumbnails')
+    ).order_by('key').values_list('key', flat=True)
+    last_key = ''
+    while True:
+        # Постранично по ключу: записи удаляются, пока идет обход.
+        batch = list(keys.filter(key__gt=last_key)[:batch_size])
+        if not batch:
+            return
+        last_key = batch[-1]
+        image_keys = [add_prefix(del_prefix(key)) for key in batch]
+        sources = [
+            deserialize_image_file(value)
+            for value in KVStoreModel.objects.filter(
+                key__in=image_keys
+            ).values_list('value', flat=True)
+        ]
+        used = set(
+            Post.objects.filter(
+                image__in=[source.name for source in sources]
+            ).values_list('image', flat=True)
+        )
+        orphans = [
+            source for source in sources
+            if source.name not in used and not source.exists()
+        ]
+        if orphans:
+            yield orphans
+
+
+def thumbnails_of(source):
+    """Файлы миниатюр исходника (имя, байты) по хранилищу ключей sorl."""
+    keys = default.kvstore._get(source.key, identity='thumbnails') or []
+    found = []
+    for key in keys:
+        thumbnail = default.kvstore._get(key)
+        if thumbnail is None:
+            continue
+        try:
+            size = thumbnail.storage.size(thumbnail.name)
+        except OSError:
+            size = 0
+        found.append((thumbnail.name, size))
+    return found
+
+
+def delete_source(source):
+    """Удаляет миниатюры исходника и его записи в хранилище ключей."""
+    default.kvstore.delete(source)
+
+
+def image_thumbnails(name):
+    return thumbnails_of(ImageFile(name, default_storage))
+
+
+def delete_file(name):
+    default_storage.delete(name)
+
+
+def delete_image(name):
+    """Удаляет картинку поста вместе с ее миниатюрами."""
+    delete_source(ImageFile(name, default_storage))
+    default_storage.delete(name)
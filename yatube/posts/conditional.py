@@ -0,0 +1,106 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.views.decorators.http import condition
+
+from . import versions
+from .models import Follow, Group, Post, User
+
+# Last-Modified точен до секунды, а версии — до микросекунды. Пока
+# новейшей версии меньше секунды, заголовок не отдается: иначе правка в
+# ту же секунду дала бы клиенту с одним If-Modified-Since ложный 304.
+LAST_MODIFIED_MIN_AGE = 1000000
+
+
+def versioned(scopes_func):
+    """condition() с ETag и Last-Modified по версиям областей.
+
+    scopes_func(request, **kwargs) возвращает области, от которых
+    зависит страница, или None, если валидаторы не нужны (например,
+    объекта нет и вид ответит 404). Версии читаются из кэша, поэтому
+    304 отдается до запросов ленты и рендера шаблона.
+    """
+
+    def current(request, *args, **kwargs):
+        if not hasattr(request, '_page_versions'):
+            scopes = scopes_func(request, *args, **kwargs)
+            request._page_versions = (
+                None if scopes is None else versions.get_many(scopes)
+            )
+        return request._page_versions
+
+    def etag(request, *args, **kwargs):
+        state = current(request, *args, **kwargs)
+        if state is None:
+            return None
+        parts = [
+            request.resolver_match.view_name,
+            request.GET.urlencode(),
+            str(request.user.pk),
+        ] + [f'{scope}={state[scope]}' for scope in sorted(state)]
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        state = current(request, *args, **kwargs)
+        if not state:
+            return None
+        newest = max(state.values())
+        if versions.now() - newest < LAST_MODIFIED_MIN_AGE:
+            return None
+        return datetime.fromtimestamp(newest / 1000000, tz=timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def index_scopes(request):
+    return [versions.ALL_POSTS]
+
+
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    return None if group_id is None else [versions.group(group_id)]
+
+
+def profile_scopes(request, username):
+    """Страница автора; правка его групп меняет author:<id>."""
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    scopes = [versions.author(author_id)]
+    if request.user.is_authenticated:
+        # Кнопка подписки зависит от подписок того, кто смотрит.
+        scopes.append(versions.author(request.user.pk))
+    return scopes
+
+
+def post_detail_scopes(request, post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if row is None:
+        return None
+    author_id, group_id = row
+    scopes = [versions.post(post_id), versions.author(author_id)]
+    if group_id is not None:
+        scopes.append(versions.group(group_id))
+    return scopes
+
+
+def follow_scopes(request):
+    """Лента подписок меняется с постами авторов и подписками читателя.
+
+    Записи ленты пишет воркер (posts.timeline), он же затем меняет
+    author:<id> читателя.
+    """
+    if not request.user.is_authenticated:
+        return None
+    author_ids = Follow.objects.filter(user=request.user).values_list(
+        'author_id', flat=True
+    )
+    return [versions.author(request.user.pk)] + [
+        versions.author(author_id) for author_id in author_ids
+    ]
@@ -0,0 +1,145 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from core import tasks
+
+from . import versions
+from .models import Comment, Counter, Follow, Post
+
+ALL_POSTS = 'all_posts'
+AUTHOR_POSTS = 'author_posts'
+GROUP_POSTS = 'group_posts'
+POST_COMMENTS = 'post_comments'
+FOLLOWERS = 'followers'
+FOLLOWING = 'following'
+
+# Счетчик -> область страниц (posts.versions), на которых он выводится.
+SCOPES = {
+    ALL_POSTS: lambda object_id: versions.ALL_POSTS,
+    AUTHOR_POSTS: versions.author,
+    GROUP_POSTS: versions.group,
+    POST_COMMENTS: versions.post,
+    FOLLOWERS: versions.author,
+    FOLLOWING: versions.author,
+}
+
+
+def incr(name, object_id=0, delta=1):
+    """Атомарно меняет счетчик на delta, создавая строку при первом +1."""
+    if object_id is None or not delta:
+        return
+    counters = Counter.objects.filter(name=name, object_id=object_id)
+    with transaction.atomic():
+        if counters.update(value=F('value') + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                Counter.objects.create(
+                    name=name, object_id=object_id, value=delta
+                )
+        except IntegrityError:
+            counters.update(value=F('value') + delta)
+
+
+@tasks.task(batch=True)
+def apply(batch):
+    """Применяет изменения из пачки задач, сложив их по счетчикам.
+
+    Страницы со счетчиками получают новые версии уже здесь: запрос,
+    поставивший задачу, менял версии до того, как счетчик изменился.
+    """
+    totals = defaultdict(int)
+    for (changes,) in batch:
+        for name, object_id, delta in changes:
+            totals[(name, object_id)] += delta
+    scopes = set()
+    for (name, object_id), delta in sorted(totals.items()):
+        if delta:
+            incr(name, object_id, delta)
+            scopes.add(SCOPES[name](object_id))
+    versions.bump_on_commit(*sorted(scopes))
+
+
+def add(*changes):
+    """Ставит изменения (имя, id, delta) в очередь одной задачей."""
+    changes = [
+        [name, object_id, delta]
+        for name, object_id, delta in changes
+        if object_id is not None and delta
+    ]
+    if changes:
+        apply.delay(changes)
+
+
+def get_many(keys):
+    """Значения счетчиков для пар (имя, id); отсутствующие равны 0."""
+    keys = list(keys)
+    values = dict.fromkeys(keys, 0)
+    if not keys:
+        return values
+    query = Q()
+    for name, object_id in keys:
+        query |= Q(name=name, object_id=object_id)
+    for name, object_id, value in Counter.objects.filter(query).values_list(
+        'name', 'object_id', 'value'
+    ):
+        values[(name, object_id)] = value
+    return values
+
+
+def get(name, object_id=0):
+    return get_many([(name, object_id)])[(name, object_id)]
+
+
+def clear(name, object_id):
+    Counter.objects.filter(name=name, object_id=object_id).delete()
+
+
+def expected_values():
+    """Точные значения всех счетчиков, посчитанные по таблицам."""
+    expected = {(ALL_POSTS, 0): Post.objects.count()}
+    sources = (
+        (AUTHOR_POSTS, Post.objects, 'author'),
+        (GROUP_POSTS, Post.objects.exclude(group=None), 'group'),
+        (POST_COMMENTS, Comment.objects, 'post'),
+        (FOLLOWERS, Follow.objects, 'author'),
+        (FOLLOWING, Follow.objects, 'user'),
+    )
+    for name, queryset, field in sources:
+        rows = queryset.order_by().values(field).annotate(total=Count('pk'))
+        for row in rows:
+            expected[(name, row[field])] = row['total']
+    return expected
+
+
+def reconcile(dry_run=False):
+    """Сверяет счетчики с таблицами и чинит расхождения.
+
+    Возвращает список (имя, id, было, стало) для исправленных счетчиков.
+    """
+    fixes = []
+    with transaction.atomic():
+        expected = expected_values()
+        actual = {
+            (name, object_id): value
+            for name, object_id, value in Counter.objects.values_list(
+                'name', 'object_id', 'value'
+            )
+        }
+        for key in actual.keys() | expected.keys():
+            old, new = actual.get(key), expected.get(key, 0)
+            if old == new or (old is None and not new):
+                continue
+            fixes.append((*key, old or 0, new))
+            if dry_run:
+                continue
+            name, object_id = key
+            if new:
+                Counter.objects.update_or_create(
+                    name=name, object_id=object_id, defaults={'value': new}
+                )
+            else:
+                clear(name, object_id)
+    return sorted(fixes)
@@ -0,0 +1,73 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.text import compress_sequence
+
+from .models import Comment, Post
+
+POST_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'group': 'group__slug',
+    'pub_date': 'pub_date',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+
+def walk(queryset, fields, batch_size):
+    """Пачки строк queryset по возрастанию pk.
+
+    Каждая пачка — отдельный запрос pk > последнего, поэтому в памяти
+    одновременно только batch_size строк при любом объеме таблицы.
+    """
+    queryset = queryset.order_by('pk').values_list(*fields)
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield rows
+
+
+def records(posts, comments, batch_size):
+    """Пачки записей в формате import_content: посты, затем комментарии."""
+    sources = (
+        ('post', posts, POST_FIELDS),
+        ('comment', comments, COMMENT_FIELDS),
+    )
+    for kind, queryset, fields in sources:
+        names = list(fields)
+        for rows in walk(queryset, fields.values(), batch_size):
+            yield [
+                {'type': kind, **dict(zip(names, row))} for row in rows
+            ]
+
+
+def ndjson(batches):
+    """Пачка записей -> кусок NDJSON в байтах, по строке на запись."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for batch in batches:
+        yield ''.join(
+            encoder.encode(record) + '\n' for record in batch
+        ).encode()
+
+
+def stream(posts, comments, batch_size, gzip=False):
+    """Байты выгрузки; с gzip сжимаются на лету по пачкам."""
+    chunks = ndjson(records(posts, comments, batch_size))
+    return compress_sequence(chunks) if gzip else chunks
+
+
+def user_content(user):
+    """Посты и комментарии пользователя для выгрузки его данных."""
+    return (
+        Post.objects.filter(author=user),
+        Comment.objects.filter(author=user),
+    )
@@ -1,5 +1,8 @@
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
+from . import images
 from .models import Comment, Post
 
 
@@ -16,6 +19,33 @@ class PostForm(ModelForm):
         }
         fields = ['group', 'text', 'image']
 
+    def __init__(self, *args, too_large=(), **kwargs):
+        # too_large — поля, файлы которых отверг обработчик загрузки
+        # (core.uploads.too_large_uploads).
+        super().__init__(*args, **kwargs)
+        self.too_large = too_large
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            images.check_upload(image)
+            images.shrink(image)
+        return image
+
+    def clean(self):
+        if self.add_prefix('image') in self.too_large:
+            self.add_error('image', images.file_too_large())
+        upload = self.files.get(self.add_prefix('image'))
+        if upload is not None and 'image' in self.errors:
+            # ImageField отвергает картинку-бомбу как битую; показываем
+            # настоящую причину.
+            try:
+                images.check_upload(upload)
+            except ValidationError as error:
+                del self.errors['image']
+                self.add_error('image', error)
+        return super().clean()
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,85 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+
+def file_too_large():
+    return ValidationError(
+        'Файл больше %(limit)s.',
+        code='file_too_large',
+        params={'limit': filesizeformat(settings.FILE_UPLOAD_MAX_SIZE)},
+    )
+
+
+def check_upload(file):
+    """Проверяет размер файла и картинки по заголовку, не декодируя ее."""
+    if file.size > settings.FILE_UPLOAD_MAX_SIZE:
+        raise file_too_large()
+    file.seek(0)
+    try:
+        # Image.open читает только заголовок; пиксели не декодируются.
+        with Image.open(file) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        width, height = settings.POST_IMAGE_MAX_PIXELS + 1, 1
+    except Exception:
+        # Разбор битых файлов оставляем forms.ImageField.
+        return
+    finally:
+        file.seek(0)
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+
+
+def shrink(file):
+    """Уменьшает картинку до POST_IMAGE_MAX_SIDE по большей стороне.
+
+    Image.thumbnail с reducing_gap декодирует JPEG сразу в уменьшенном
+    масштабе (draft), а прочие форматы декодирует целиком и лишь затем
+    сжимает быстрым reduce. Поэтому память на них ограничивает только
+    POST_IMAGE_MAX_PIXELS, который check_upload проверяет по заголовку
+    до вызова shrink. Результат записывается в тот же загруженный файл.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    file.seek(0)
+    with Image.open(file) as image:
+        if max(image.size) > max_side and not getattr(
+            image, 'is_animated', False
+        ):
+            format_ = image.format
+            image.thumbnail((max_side, max_side), reducing_gap=2.0)
+            file.seek(0)
+            file.truncate()
+            image.save(file, format_, quality=90, optimize=True)
+            file.size = file.tell()
+    file.seek(0)
+
+
+def digest(file):
+    """SHA-256 и размер файла; читает его кусками."""
+    sha256 = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks():
+        sha256.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return sha256.hexdigest(), size
+
+
+def shard_name(image_hash, filename):
+    """Имя по содержимому внутри upload_to: ab/cd/<sha256>.<ext>.
+
+    Две цифры хэша на уровень дают 65536 каталогов, так что в каждом
+    лежит немного файлов даже при миллионах картинок.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{image_hash[:2]}/{image_hash[2:4]}/{image_hash}{extension}'
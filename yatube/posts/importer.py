@@ -0,0 +1,378 @@
+import csv
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, timeline, versions
+from .cleanup import chunked
+from .models import Comment, Follow, Group, Post
+from .search import fts_enabled
+
+User = get_user_model()
+
+search_index = import_module('posts.migrations.0012_post_search')
+
+# Сколько значений подставлять в один запрос с IN (...).
+LOOKUP_BATCH_SIZE = 500
+
+
+def read_rows(file, file_format):
+    """(номер строки, запись) из JSONL или CSV.
+
+    Пустые поля CSV опускаются; строка с ошибкой JSON дает запись None.
+    """
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(file), 2):
+            yield number, {
+                key: value for key, value in row.items() if value
+            }
+        return
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'некорректная дата {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+@contextmanager
+def original_dates():
+    """Даты из источника вместо auto_now_add на время импорта."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def deferred_indexes():
+    """Снимает вторичные индексы постов и комментариев и триггеры поиска.
+
+    После импорта индексы строятся заново одним проходом, а не
+    обновляются на каждой вставленной строке. Таблица поиска остается на
+    месте, чтобы сайт искал по ней и во время импорта; новые посты
+    попадают в нее при перестроении в конце.
+    """
+    models = (Post, Comment)
+    search = fts_enabled()
+    with connection.schema_editor() as editor:
+        if search:
+            search_index.drop_triggers(editor)
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+            if search:
+                search_index.create_triggers(
+                    editor, User._meta.db_table, search_index.TRIGGERS
+                )
+                editor.execute(search_index.REBUILD)
+
+
+def reserve_ids(model, count):
+    """Выдает count свободных id модели для вставки с явным pk.
+
+    На SQLite сдвигает счетчик AUTOINCREMENT в sqlite_sequence: id
+    удаленных постов не достаются новым, а UPDATE сразу берет блокировку
+    записи, так что пост сайта не займет те же id до конца транзакции.
+    На PostgreSQL id берутся из последовательности таблицы.
+    """
+    if not count:
+        return []
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                [table, model._meta.pk.column, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+        if connection.vendor != 'sqlite':
+            raise NotImplementedError(
+                f'Резервирование id не поддерживается для {connection.vendor}'
+            )
+        cursor.execute(
+            'UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s',
+            [count, table],
+        )
+        if not cursor.rowcount:
+            # В таблицу еще ни разу не вставляли строк.
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                [table, count],
+            )
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s', [table]
+        )
+        last = cursor.fetchone()[0]
+    return list(range(last - count + 1, last + 1))
+
+
+def _lookup(queryset, field, values):
+    """Словарь field -> pk для values, по LOOKUP_BATCH_SIZE за запрос."""
+    found = {}
+    for batch in chunked(sorted(values), LOOKUP_BATCH_SIZE):
+        found.update(
+            queryset.filter(**{f'{field}__in': batch}).values_list(
+                field, 'pk'
+            )
+        )
+    return found
+
+
+def _existing_follows(pairs):
+    existing = set()
+    for batch in chunked(sorted(pairs), LOOKUP_BATCH_SIZE):
+        existing.update(
+            Follow.objects.filter(
+                user_id__in={user_id for user_id, _ in batch},
+                author_id__in={author_id for _, author_id in batch},
+            ).values_list('user_id', 'author_id')
+        )
+    return existing
+
+
+class Importer:
+    """Пакетный импорт постов, комментариев и подписок.
+
+    Пользователи и группы ищутся по словарям в памяти, которые
+    дополняются одним запросом на пачку строк; неизвестные пользователи
+    создаются без пароля, строки с неизвестной группой пропускаются.
+    Комментарии ссылаются на посты по id из источника.
+    """
+
+    def __init__(self, batch_size=1000, on_skip=None):
+        self.batch_size = batch_size
+        self.on_skip = on_skip
+        self.users = {}
+        self.groups = {}
+        self.posts = {}
+        self.created = {'post': 0, 'comment': 0, 'follow': 0}
+        self.skipped = 0
+        self.authors = set()
+        self.follows = set()
+        self.scopes = set()
+
+    def import_rows(self, rows, chunk_size):
+        """Импортирует строки; после каждой транзакции отдает их число."""
+        with original_dates():
+            for chunk in chunked(rows, chunk_size):
+                with transaction.atomic():
+                    self._import_chunk(chunk)
+                yield len(chunk)
+
+    def finish(self):
+        """Раскладывает ленты и сбрасывает кэши после импорта.
+
+        Подписчикам добавляются посты авторов ниже порога подписчиков;
+        пары (подписчик, автор) читаются и ставятся в очередь пачками.
+        """
+        for author_id in self.authors:
+            timeline.forget_recent_posts(author_id)
+        authors = set()
+        for batch in chunked(sorted(self.authors), LOOKUP_BATCH_SIZE):
+            batch = set(batch) - timeline.pulled_among(batch)
+            authors |= batch
+            self._backfill(
+                Follow.objects.filter(author_id__in=batch).values_list(
+                    'user_id', 'author_id'
+                ).iterator()
+            )
+        # Новые подписки на авторов без импортированных постов.
+        follows = [
+            pair for pair in self.follows if pair[1] not in authors
+        ]
+        for batch in chunked(follows, LOOKUP_BATCH_SIZE):
+            pulled = timeline.pulled_among({pair[1] for pair in batch})
+            self._backfill(pair for pair in batch if pair[1] not in pulled)
+        versions.bump(*self.scopes)
+
+    def _backfill(self, pairs):
+        for batch in chunked(pairs, LOOKUP_BATCH_SIZE):
+            timeline.backfill.delay_many([
+                ((user_id, author_id),
+                 f'timeline:backfill:{user_id}:{author_id}')
+                for user_id, author_id in batch
+            ])
+
+    def _bulk_create(self, model, objs):
+        # Django 2.2 не ограничивает явный batch_size лимитами SQLite на
+        # число параметров и слагаемых UNION в одном запросе.
+        limit = connection.ops.bulk_batch_size(
+            model._meta.concrete_fields, objs
+        )
+        model.objects.bulk_create(
+            objs, batch_size=max(min(self.batch_size, limit), 1)
+        )
+
+    def _skip(self, number, reason):
+        self.skipped += 1
+        if self.on_skip:
+            self.on_skip(number, reason)
+
+    def _import_chunk(self, chunk):
+        rows = {'post': [], 'comment': [], 'follow': []}
+        for number, row in chunk:
+            kind = row.get('type') if isinstance(row, dict) else None
+            if kind not in rows:
+                self._skip(number, 'неизвестный тип записи')
+                continue
+            rows[kind].append((number, row))
+        # Первой записью транзакции: дальше она держит блокировку.
+        post_ids = iter(reserve_ids(Post, len(rows['post'])))
+        self._resolve_users(
+            row[field] for _, row in chunk if isinstance(row, dict)
+            for field in ('author', 'user') if row.get(field)
+        )
+        self._resolve_groups(
+            row['group'] for _, row in rows['post'] if row.get('group')
+        )
+        changes = defaultdict(int)
+        self._import_posts(rows['post'], post_ids, changes)
+        self._import_comments(rows['comment'], changes)
+        self._import_follows(rows['follow'], changes)
+        counters.add(*(
+            (name, object_id, delta)
+            for (name, object_id), delta in sorted(changes.items())
+        ))
+
+    def _resolve_users(self, usernames):
+        missing = set(usernames) - self.users.keys()
+        if not missing:
+            return
+        self.users.update(_lookup(User.objects, 'username', missing))
+        new = sorted(missing - self.users.keys())
+        if not new:
+            return
+        users = [User(username=username) for username in new]
+        for user in users:
+            user.set_unusable_password()
+        self._bulk_create(User, users)
+        self.users.update(_lookup(User.objects, 'username', new))
+
+    def _resolve_groups(self, slugs):
+        missing = set(slugs) - self.groups.keys()
+        if missing:
+            self.groups.update(_lookup(Group.objects, 'slug', missing))
+
+    def _group_id(self, row):
+        slug = row.get('group')
+        if slug is None:
+            return None
+        if slug not in self.groups:
+            raise KeyError(f'группа {slug}')
+        return self.groups[slug]
+
+    def _import_posts(self, rows, ids, changes):
+        # bulk_create на SQLite не возвращает id, а комментариям нужны
+        # id постов: они заранее берутся из reserve_ids.
+        posts = []
+        for number, row in rows:
+            try:
+                post = Post(
+                    pk=next(ids),
+                    author_id=self.users[row['author']],
+                    text=row['text'],
+                    group_id=self._group_id(row),
+                    pub_date=parse_date(row.get('pub_date')),
+                )
+            except (KeyError, ValueError) as error:
+                self._skip(number, f'нет {error}')
+                continue
+            if 'id' in row:
+                self.posts[str(row['id'])] = post.pk
+            posts.append(post)
+            changes[(counters.ALL_POSTS, 0)] += 1
+            changes[(counters.AUTHOR_POSTS, post.author_id)] += 1
+            if post.group_id:
+                changes[(counters.GROUP_POSTS, post.group_id)] += 1
+            self.authors.add(post.author_id)
+            # У новых id нет закэшированных страниц: post:<id> не нужен,
+            # а миллион таких версий вытеснил бы из кэша все остальное.
+            self.scopes.update(
+                (versions.ALL_POSTS, versions.author(post.author_id))
+            )
+            if post.group_id:
+                self.scopes.add(versions.group(post.group_id))
+        self._bulk_create(Post, posts)
+        self.created['post'] += len(posts)
+
+    def _import_comments(self, rows, changes):
+        comments = []
+        for number, row in rows:
+            try:
+                comment = Comment(
+                    post_id=self.posts[str(row['post'])],
+                    author_id=self.users[row['author']],
+                    text=row['text'],
+                    created=parse_date(row.get('created')),
+                )
+            except (KeyError, ValueError) as error:
+                self._skip(number, f'нет {error}')
+                continue
+            comments.append(comment)
+            changes[(counters.POST_COMMENTS, comment.post_id)] += 1
+        self._bulk_create(Comment, comments)
+        self.created['comment'] += len(comments)
+
+    def _import_follows(self, rows, changes):
+        pairs = {}
+        for number, row in rows:
+            try:
+                pair = (self.users[row['user']], self.users[row['author']])
+            except KeyError as error:
+                self._skip(number, f'нет {error}')
+                continue
+            if pair[0] == pair[1]:
+                self._skip(number, 'подписка на себя')
+            elif pair in pairs:
+                self._skip(number, 'повторная подписка')
+            else:
+                pairs[pair] = number
+        existing = _existing_follows(pairs)
+        follows = []
+        for (user_id, author_id), number in pairs.items():
+            if (user_id, author_id) in existing:
+                self._skip(number, 'повторная подписка')
+                continue
+            follows.append(Follow(user_id=user_id, author_id=author_id))
+            changes[(counters.FOLLOWERS, author_id)] += 1
+            changes[(counters.FOLLOWING, user_id)] += 1
+            self.follows.add((user_id, author_id))
+            self.scopes.update(
+                (versions.author(author_id), versions.author(user_id))
+            )
+        self._bulk_create(Follow, follows)
+        self.created['follow'] += len(follows)
@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from posts import cleanup
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки без постов и миниатюры, которые больше '
+            'не нужны')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать, сколько места освободится',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько файлов проверять и удалять за раз',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах между пачками удалений',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=24,
+            help='Не трогать файлы моложе стольких часов',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        self.pause = options['pause']
+        self.files, self.bytes = 0, 0
+        batch_size = options['batch_size']
+        min_age = options['min_age'] * 60 * 60
+
+        for batch in cleanup.orphan_images(min_age, batch_size):
+            for name, size in batch:
+                self.count(name, size)
+                self.count_thumbnails(cleanup.image_thumbnails(name))
+            self.delete(cleanup.delete_image, [name for name, _ in batch])
+
+        for batch in cleanup.orphan_sources(batch_size):
+            for source in batch:
+                self.count_thumbnails(cleanup.thumbnails_of(source))
+            self.delete(cleanup.delete_source, batch)
+
+        for batch in cleanup.unregistered_thumbnails(min_age, batch_size):
+            for name, size in batch:
+                self.count(name, size)
+            self.delete(cleanup.delete_file, [name for name, _ in batch])
+
+        verb = 'Можно освободить' if self.dry_run else 'Освобождено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: {filesizeformat(self.bytes)} '
+            f'в {self.files} файлах'
+        ))
+
+    def count(self, name, size):
+        self.files += 1
+        self.bytes += size
+        if self.verbosity > 1:
+            self.stdout.write(name)
+
+    def count_thumbnails(self, thumbnails):
+        for name, size in thumbnails:
+            self.count(name, size)
+
+    def delete(self, delete, items):
+        if self.dry_run:
+            return
+        for item in items:
+            delete(item)
+        time.sleep(self.pause)
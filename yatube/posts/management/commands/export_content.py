@@ -0,0 +1,56 @@
+import sys
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Comment, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты и комментарии в NDJSON (формат import_content)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Файл для выгрузки; по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--author',
+            help='Выгрузить только посты и комментарии этого пользователя',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать выгрузку gzip на лету',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EXPORT_BATCH_SIZE,
+            help='Сколько строк читать одним запросом',
+        )
+
+    def open(self, path):
+        if path == '-':
+            return nullcontext(sys.stdout.buffer)
+        return open(path, 'wb')
+
+    def handle(self, *args, **options):
+        if options['author']:
+            user = User.objects.filter(username=options['author']).first()
+            if user is None:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден'
+                )
+            posts, comments = export.user_content(user)
+        else:
+            posts, comments = Post.objects.all(), Comment.objects.all()
+        chunks = export.stream(
+            posts, comments, options['batch_size'], gzip=options['gzip']
+        )
+        with self.open(options['output']) as output:
+            for chunk in chunks:
+                output.write(chunk)
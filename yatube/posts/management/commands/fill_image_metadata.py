@@ -0,0 +1,51 @@
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+FIELDS = ('image_width', 'image_height', 'image_size', 'image_hash')
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры, вес и хэш картинок у старых постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов обрабатывать за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        pending = Post.objects.filter(image_hash='').exclude(image='')
+        last_pk, filled, missing = 0, 0, 0
+        while True:
+            rows = list(
+                pending.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', 'image'
+                )[:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            posts = []
+            for pk, name in rows:
+                try:
+                    with default_storage.open(name) as file:
+                        image_hash, size = images.digest(file)
+                        width, height = get_image_dimensions(file)
+                except OSError:
+                    missing += 1
+                    continue
+                posts.append(Post(
+                    pk=pk, image_width=width, image_height=height,
+                    image_size=size, image_hash=image_hash,
+                ))
+            Post.objects.bulk_update(posts, FIELDS)
+            filled += len(posts)
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено постов: {filled}, файлов не найдено: {missing}'
+        ))
@@ -0,0 +1,53 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def _generate(item):
+    post_id, name = item
+    try:
+        thumbnails.generate(name, post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Создает недостающие варианты картинок постов из media/posts/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов (по умолчанию — по числу ядер)',
+        )
+
+    def handle(self, *args, **options):
+        items = list(
+            Post.objects.filter(image__startswith='posts/')
+            .order_by('pk').values_list('pk', 'image')
+        )
+        workers = max(options['workers'] or 1, 1)
+        if workers == 1:
+            results = [_generate(item) for item in items]
+        else:
+            # Дочерние процессы открывают свои соединения с БД.
+            connections.close_all()
+            pool = ProcessPoolExecutor(workers, initializer=django.setup)
+            with pool:
+                results = list(pool.map(_generate, items, chunksize=16))
+        failed = results.count(False)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(results)}, с ошибками: {failed}'
+        ))
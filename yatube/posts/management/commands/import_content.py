@@ -0,0 +1,83 @@
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты, комментарии и подписки из JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл с записями; «-» — читать из stdin',
+        )
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'csv'),
+            help='Формат файла; по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк вставлять одним запросом',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Сколько строк импортировать в одной транзакции',
+        )
+        parser.add_argument(
+            '--defer-indexes',
+            action='store_true',
+            help='Снять вторичные индексы на время импорта и '
+                 'построить заново в конце',
+        )
+
+    def open(self, path):
+        if path == '-':
+            return nullcontext(sys.stdin)
+        return open(path, encoding='utf-8', newline='')
+
+    def report_skip(self, number, reason):
+        if self.verbosity >= 2:
+            self.stderr.write(f'Строка {number} пропущена: {reason}')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        content = importer.Importer(
+            batch_size=options['batch_size'], on_skip=self.report_skip
+        )
+        indexes = (
+            importer.deferred_indexes() if options['defer_indexes']
+            else nullcontext()
+        )
+        started = time.monotonic()
+        total = 0
+        with self.open(path) as file, indexes:
+            rows = importer.read_rows(file, file_format)
+            for count in content.import_rows(rows, options['chunk_size']):
+                total += count
+                if self.verbosity >= 2:
+                    rate = total / (time.monotonic() - started)
+                    self.stdout.write(f'{total} строк, {rate:.0f} строк/с')
+        content.finish()
+        elapsed = time.monotonic() - started
+        created = content.created
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {created["post"]}, '
+            f'комментариев: {created["comment"]}, '
+            f'подписок: {created["follow"]}; '
+            f'пропущено строк: {content.skipped}. '
+            f'{total} строк за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} строк/с)'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики и чинит расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        fixes = counters.reconcile(dry_run=options['dry_run'])
+        for name, object_id, old, new in fixes:
+            self.stdout.write(f'{name}[{object_id}]: {old} -> {new}')
+        verb = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(
+            self.style.SUCCESS(f'{verb} расхождений: {len(fixes)}')
+        )
@@ -0,0 +1,72 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import images, thumbnails, versions
+from posts.models import Post
+
+SHARDED = r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/'
+
+
+class Command(BaseCommand):
+    help = 'Переносит картинки постов в каталоги по хэшу содержимого'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов переносить за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        legacy = Post.objects.exclude(image='').exclude(image__regex=SHARDED)
+        last_pk, moved, missing = 0, 0, 0
+        while True:
+            rows = list(
+                legacy.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', 'image', 'image_hash', 'author_id', 'group_id'
+                )[:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            targets, scopes, queued = {}, set(), {}
+            for pk, name, image_hash, author_id, group_id in rows:
+                if name not in targets:
+                    target = self.copy(name, image_hash)
+                    if target is None:
+                        missing += 1
+                        continue
+                    targets[name] = target
+                queued.setdefault(targets[name][0], pk)
+                scopes.update((versions.author(author_id), versions.post(pk)))
+                if group_id:
+                    scopes.add(versions.group(group_id))
+            with transaction.atomic():
+                for name, (target, image_hash) in targets.items():
+                    moved += Post.objects.filter(image=name).update(
+                        image=target, image_hash=image_hash
+                    )
+            for name in targets:
+                default_storage.delete(name)
+            versions.bump(versions.ALL_POSTS, *scopes)
+            # Миниатюры по новым путям: страницы их в очередь не ставят.
+            thumbnails._submit(*queued.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено постов: {moved}, постов без файла: {missing}'
+        ))
+
+    def copy(self, name, image_hash):
+        """Копирует файл на место по хэшу; (новое имя, хэш) или None."""
+        try:
+            with default_storage.open(name) as file:
+                image_hash = image_hash or images.digest(file)[0]
+                target = Post._meta.get_field('image').generate_filename(
+                    None, images.shard_name(image_hash, name)
+                )
+                if not default_storage.exists(target):
+                    target = default_storage.save(target, file)
+        except OSError:
+            return None
+        return target, image_hash
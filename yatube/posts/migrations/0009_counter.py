@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:14
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Counter = apps.get_model('posts', 'Counter')
+    counters = [Counter(name='all_posts', object_id=0,
+                        value=Post.objects.count())]
+    sources = (
+        ('author_posts', Post.objects, 'author'),
+        ('group_posts', Post.objects.exclude(group=None), 'group'),
+        ('post_comments', Comment.objects, 'post'),
+        ('followers', Follow.objects, 'author'),
+        ('following', Follow.objects, 'user'),
+    )
+    for name, queryset, field in sources:
+        rows = queryset.order_by().values(field).annotate(total=Count('pk'))
+        counters.extend(
+            Counter(name=name, object_id=row[field], value=row['total'])
+            for row in rows
+        )
+    Counter.objects.bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_auto_20220619_1243'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, verbose_name='Счетчик')),
+                ('object_id', models.PositiveIntegerField(default=0, verbose_name='ID объекта')),
+                ('value', models.IntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Счетчик',
+                'verbose_name_plural': 'Счетчики',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='counter',
+            constraint=models.UniqueConstraint(fields=('name', 'object_id'), name='unique_counter'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.db import migrations
+
+# Полнотекстовый индекс FTS5 с внешним содержимым: текст поста, название
+# группы и имя автора берутся из представления posts_post_search_source,
+# а триггеры поддерживают индекс при изменении постов, групп и авторов.
+SOURCE_VIEW = '''
+CREATE VIEW posts_post_search_source AS
+SELECT p.id AS id,
+       p.text AS text,
+       COALESCE(g.title, '') AS group_title,
+       u.username || ' ' || u.first_name || ' ' || u.last_name AS author_name
+FROM posts_post p
+JOIN {user_table} u ON u.id = p.author_id
+LEFT JOIN posts_group g ON g.id = p.group_id
+'''
+
+FTS_TABLE = '''
+CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+    text, group_title, author_name,
+    content='posts_post_search_source',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+'''
+
+DELETE_ROWS = '''
+INSERT INTO posts_post_fts(posts_post_fts, rowid, text, group_title,
+                           author_name)
+SELECT 'delete', id, text, group_title, author_name
+FROM posts_post_search_source WHERE {condition};
+'''
+
+INSERT_ROWS = '''
+INSERT INTO posts_post_fts(rowid, text, group_title, author_name)
+SELECT id, text, group_title, author_name
+FROM posts_post_search_source WHERE {condition};
+'''
+
+# user.save() пишет все поля (например, last_login при входе), поэтому
+# посты автора переиндексируются, только если имя действительно сменилось.
+NAME_CHANGED = (
+    'WHEN old.username IS NOT new.username '
+    'OR old.first_name IS NOT new.first_name '
+    'OR old.last_name IS NOT new.last_name'
+)
+
+TRIGGERS = (
+    ('posts_post_fts_ai', 'AFTER INSERT ON posts_post', INSERT_ROWS,
+     'id = new.id'),
+    ('posts_post_fts_bd', 'BEFORE DELETE ON posts_post', DELETE_ROWS,
+     'id = old.id'),
+    ('posts_post_fts_bu',
+     'BEFORE UPDATE OF text, group_id, author_id ON posts_post',
+     DELETE_ROWS, 'id = old.id'),
+    ('posts_post_fts_au',
+     'AFTER UPDATE OF text, group_id, author_id ON posts_post',
+     INSERT_ROWS, 'id = new.id'),
+    ('posts_group_fts_bu', 'BEFORE UPDATE OF title ON posts_group',
+     DELETE_ROWS, 'id IN (SELECT id FROM posts_post '
+                  'WHERE group_id = old.id)'),
+    ('posts_group_fts_au', 'AFTER UPDATE OF title ON posts_group',
+     INSERT_ROWS, 'id IN (SELECT id FROM posts_post '
+                  'WHERE group_id = new.id)'),
+    ('posts_user_fts_bu',
+     'BEFORE UPDATE OF username, first_name, last_name ON {user_table} '
+     + NAME_CHANGED,
+     DELETE_ROWS, 'id IN (SELECT id FROM posts_post '
+                  'WHERE author_id = old.id)'),
+    ('posts_user_fts_au',
+     'AFTER UPDATE OF username, first_name, last_name ON {user_table} '
+     + NAME_CHANGED,
+     INSERT_ROWS, 'id IN (SELECT id FROM posts_post '
+                  'WHERE author_id = new.id)'),
+)
+
+
+REBUILD = "INSERT INTO posts_post_fts(posts_post_fts) VALUES('rebuild')"
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def create_triggers(schema_editor, user_table, triggers):
+    for name, event, body, condition in triggers:
+        schema_editor.execute(
+            'CREATE TRIGGER {name} {event} BEGIN {body} END'.format(
+                name=name,
+                event=event.format(user_table=user_table),
+                body=body.format(condition=condition),
+            )
+        )
+
+
+def create_search_index(apps, schema_editor):
+    if not fts5_available(schema_editor.connection):
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    schema_editor.execute(SOURCE_VIEW.format(user_table=user_table))
+    schema_editor.execute(FTS_TABLE)
+    create_triggers(schema_editor, user_table, TRIGGERS)
+    schema_editor.execute(REBUILD)
+
+
+def drop_triggers(schema_editor):
+    for name, *_ in TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    drop_triggers(schema_editor)
+    schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+    schema_editor.execute('DROP VIEW IF EXISTS posts_post_search_source')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:35
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite пересоздает posts_post при изменении полей, а представление и
+# триггеры полнотекстового индекса на нее ссылаются: снимаем их на время.
+search_index = import_module('posts.migrations.0012_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search_index.drop_search_index,
+            search_index.create_search_index,
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='SHA-256 картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Размер картинки в байтах'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(
+            search_index.create_search_index,
+            search_index.drop_search_index,
+        ),
+    ]
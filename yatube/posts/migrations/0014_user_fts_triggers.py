@@ -0,0 +1,33 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations
+
+search_index = import_module('posts.migrations.0012_post_search')
+
+USER_TRIGGERS = [
+    trigger for trigger in search_index.TRIGGERS
+    if trigger[0].startswith('posts_user_fts')
+]
+
+
+def recreate_user_triggers(apps, schema_editor):
+    """Триггеры автора из 0012 срабатывают только при смене имени."""
+    if not search_index.fts5_available(schema_editor.connection):
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    for name, *_ in USER_TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    search_index.create_triggers(schema_editor, user_table, USER_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_post_image_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_user_triggers, migrations.RunPython.noop),
+    ]
@@ -40,11 +40,41 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер картинки в байтах', null=True, blank=True, editable=False
+    )
+    image_hash = models.CharField(
+        'SHA-256 картинки',
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -69,6 +99,12 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментрий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=('post', 'created', 'id'),
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -89,15 +125,78 @@ class Follow(models.Model):
     )
 
     class Meta:
-        models.UniqueConstraint(
-            fields=('user', 'author'),
-            name='unique_follow'
-        )
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow'
+            ),
             models.CheckConstraint(
                 check=~models.Q(user=models.F('author')),
                 name='check_user_not_equal_author',
             ),
         ]
+
+
+class Counter(models.Model):
+    """Денормализованный счетчик: имя счетчика и id объекта."""
+    name = models.CharField('Счетчик', max_length=32)
+    object_id = models.PositiveIntegerField('ID объекта', default=0)
+    value = models.IntegerField('Значение', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчик'
+        verbose_name_plural = 'Счетчики'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'object_id'),
+                name='unique_counter'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name}[{self.object_id}] = {self.value}'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_post'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'
+            ),
+        ]
@@ -0,0 +1,163 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+OLDER = 'older'
+NEWER = 'newer'
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (по умолчанию (pub_date, id)).
+
+    Вместо OFFSET и COUNT(*) страница выбирается условием по ключу
+    последней показанной записи, поэтому любая страница стоит одинаково.
+    Ключ страницы передается в ссылках непрозрачным токеном ?cursor=.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.ordering = tuple(ordering)
+        self.key_fields = tuple(field.lstrip('-') for field in self.ordering)
+        self.descending = self.ordering[0].startswith('-')
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def encode_cursor(self, direction, obj):
+        # Записи — экземпляры моделей или словари из values().
+        if isinstance(obj, dict):
+            values = [obj[field] for field in self.key_fields]
+        else:
+            values = [getattr(obj, field) for field in self.key_fields]
+        payload = json.dumps(
+            [direction] + [
+                value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in values
+            ],
+            separators=(',', ':'),
+        )
+        return base64.urlsafe_b64encode(
+            payload.encode()
+        ).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значения ключа) или None."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, *raw_values = json.loads(
+                base64.urlsafe_b64decode(padded.encode())
+            )
+            if direction not in (OLDER, NEWER):
+                return None
+            if len(raw_values) != len(self.key_fields):
+                return None
+            model = self.object_list.model
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.key_fields, raw_values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            return None
+        if any(value is None for value in values):
+            return None
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Условие «строго после ключа» в порядке обхода ленты."""
+        first, second = self.key_fields
+        lookup = 'lt' if self.descending == forward else 'gt'
+        return (
+            Q(**{f'{first}__{lookup}': values[0]})
+            | Q(**{first: values[0], f'{second}__{lookup}': values[1]})
+        )
+
+    def _reversed_ordering(self):
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        )
+
+    def _stream(self, values, forward):
+        """Записи после ключа в порядке обхода (назад — в обратном)."""
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        if not forward:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        return queryset
+
+    def _fetch(self, values, forward, offset=0):
+        """До per_page + 1 записей после ключа, начиная с offset."""
+        return list(
+            self._stream(values, forward)[offset:offset + self.per_page + 1]
+        )
+
+    def get_page(self, cursor):
+        """Возвращает страницу по токену; плохой токен дает первую."""
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            items = self._fetch(None, True)
+            has_next = len(items) > self.per_page
+            return self._build_page(
+                items[:self.per_page], '', False, has_next
+            )
+        direction, values = decoded
+        if direction == OLDER:
+            items = self._fetch(values, True)
+            has_next = len(items) > self.per_page
+            return self._build_page(
+                items[:self.per_page], cursor, True, has_next
+            )
+        items = self._fetch(values, False)
+        has_previous = len(items) > self.per_page
+        if not has_previous:
+            # Дошли до начала ленты: отдаем полную первую страницу.
+            return self.get_page(None)
+        items = items[:self.per_page][::-1]
+        return self._build_page(items, cursor, has_previous, True)
+
+    def get_legacy_page(self, number):
+        """Совместимость со старыми ссылками ?page=N через OFFSET."""
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        items = self._fetch(None, True, (number - 1) * self.per_page)
+        has_next = len(items) > self.per_page
+        return self._build_page(
+            items[:self.per_page], f'page-{number}', number > 1, has_next
+        )
+
+    def _build_page(self, items, cursor, has_previous, has_next):
+        page = Page(items, 1, self)
+        page.cursor = cursor
+        page.previous_cursor = (
+            self.encode_cursor(NEWER, items[0])
+            if has_previous and items else ''
+        )
+        page.next_cursor = (
+            self.encode_cursor(OLDER, items[-1])
+            if has_next and items else ''
+        )
+        return page
+
+
+def paginate(request, queryset, per_page=None, count=None,
+             ordering=('-pub_date', '-id'), paginator_class=CursorPaginator,
+             **kwargs):
+    """Страница ленты по ?cursor= или, для старых ссылок, по ?page=.
+
+    count — заранее известное число записей (из счетчиков), чтобы
+    paginator.count не выполнял COUNT(*).
+    """
+    paginator = paginator_class(
+        queryset, per_page or settings.GLOBAL_COUNT_POSTS, ordering, **kwargs
+    )
+    if count is not None:
+        paginator.count = count
+    cursor = request.GET.get('cursor')
+    page_number = request.GET.get('page')
+    if not cursor and page_number:
+        return paginator.get_legacy_page(page_number)
+    return paginator.get_page(cursor)
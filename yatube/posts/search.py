@@ -0,0 +1,99 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def fts_enabled():
+    """Индекс FTS5 создается миграцией только на SQLite с FTS5.
+
+    Ответ запоминается на процесс для каждой базы.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    return _fts_table_exists(connection.settings_dict['NAME'])
+
+
+@lru_cache(maxsize=None)
+def _fts_table_exists(database):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def match_expression(query):
+    """Строка запроса -> выражение MATCH: все слова, с поиском по префиксу.
+
+    Берутся только буквы и цифры, поэтому синтаксис FTS5 из ввода
+    пользователя не попадает в запрос.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+def matching_ids(query):
+    """Подзапрос с id подходящих постов для filter(pk__in=...)."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)],
+    )
+
+
+class SearchResults:
+    """Ленивый список найденных постов для Paginator.
+
+    Срезы выбирают id по рангу bm25 прямо из индекса и догружают посты
+    одним запросом; число результатов ограничено SEARCH_MAX_RESULTS.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.expression = match_expression(query)
+        self.use_fts = bool(self.expression) and fts_enabled()
+
+    def fallback_queryset(self):
+        return Post.objects.filter(
+            Q(text__icontains=self.query)
+            | Q(group__title__icontains=self.query)
+            | Q(author__username__icontains=self.query)
+        ).select_related('author', 'group')
+
+    def count(self):
+        if not self.expression:
+            return 0
+        if not self.use_fts:
+            limit = settings.SEARCH_MAX_RESULTS
+            return self.fallback_queryset()[:limit].count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM (SELECT 1 FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+                [self.expression, settings.SEARCH_MAX_RESULTS],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        stop = min(item.stop, settings.SEARCH_MAX_RESULTS)
+        if not self.expression or stop <= start:
+            return []
+        if not self.use_fts:
+            return list(self.fallback_queryset()[start:stop])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.expression, stop - start, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.db.models import DEFERRED
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import counters, images, timeline, versions
+from .models import Comment, Follow, Group, Post, User
+
+# Поля пользователя, из которых складывается имя автора на страницах.
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_init, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    """Запоминает группу, в которой пост учтен в счетчиках."""
+    # Из __dict__, чтобы не загружать отложенное поле.
+    instance._counted_group_id = instance.__dict__.get('group_id', DEFERRED)
+
+
+@receiver(pre_save, sender=Post)
+def fill_image_metadata(sender, instance, raw=False, **kwargs):
+    """Запоминает размеры, вес и хэш новой картинки.
+
+    Имя файла определяется содержимым, поэтому одинаковые картинки не
+    дублируются: пост ссылается на уже сохраненный файл.
+    """
+    image = instance.image
+    if raw or not image or image._committed:
+        return
+    instance.image_hash, instance.image_size = images.digest(image)
+    instance.image_width, instance.image_height = get_image_dimensions(
+        image
+    )
+    name = images.shard_name(instance.image_hash, image.name)
+    stored = image.field.generate_filename(instance, name)
+    if image.storage.exists(stored):
+        instance.image = stored
+    else:
+        image.name = name
+
+
+@receiver(post_save, sender=Post)
+def on_post_saved(sender, instance, created, **kwargs):
+    old_group_id = None if created else instance._counted_group_id
+    if old_group_id is DEFERRED:
+        # Группа не была загружена, значит save ее и не менял.
+        old_group_id = instance.group_id
+    versions.bump_on_commit(
+        *versions.for_post(instance, old_group_id)
+    )
+    changes = []
+    if created:
+        changes += [
+            (counters.ALL_POSTS, 0, 1),
+            (counters.AUTHOR_POSTS, instance.author_id, 1),
+        ]
+        timeline.forget_recent_posts(instance.author_id)
+        timeline.deliver.delay(instance.pk)
+    if old_group_id != instance.group_id:
+        changes += [
+            (counters.GROUP_POSTS, old_group_id, -1),
+            (counters.GROUP_POSTS, instance.group_id, 1),
+        ]
+    counters.add(*changes)
+    instance._counted_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def on_post_deleted(sender, instance, **kwargs):
+    versions.bump_on_commit(*versions.for_post(instance))
+    counters.add(
+        (counters.ALL_POSTS, 0, -1),
+        (counters.AUTHOR_POSTS, instance.author_id, -1),
+        (counters.GROUP_POSTS, instance.group_id, -1),
+    )
+    counters.clear(counters.POST_COMMENTS, instance.pk)
+    timeline.forget_recent_posts(instance.author_id)
+
+
+def _name(user):
+    # Из __dict__, чтобы не загружать отложенные поля.
+    return tuple(user.__dict__.get(field) for field in NAME_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_user_name(sender, instance, **kwargs):
+    """Запоминает имя, с которым автор выведен на страницах."""
+    instance._shown_name = _name(instance)
+
+
+@receiver(post_save, sender=User)
+def on_user_saved(sender, instance, created, **kwargs):
+    """Смена имени меняет ленты, группы и страницы автора."""
+    name = _name(instance)
+    if not created and name != instance._shown_name:
+        group_ids = Post.objects.filter(author_id=instance.pk).values_list(
+            'group_id', flat=True
+        ).order_by().distinct()
+        versions.bump_on_commit(
+            *versions.for_author(instance.pk, group_ids)
+        )
+    instance._shown_name = name
+
+
+def _group_scopes(group_id):
+    """Области страниц, где выводятся название и ссылка группы."""
+    author_ids = Post.objects.filter(group_id=group_id).values_list(
+        'author_id', flat=True
+    ).order_by().distinct()
+    return [versions.ALL_POSTS, versions.group(group_id)] + [
+        versions.author(pk) for pk in author_ids
+    ]
+
+
+@receiver(post_save, sender=Group)
+def on_group_saved(sender, instance, **kwargs):
+    versions.bump_on_commit(*_group_scopes(instance.pk))
+
+
+@receiver(pre_delete, sender=Group)
+def on_group_deleted(sender, instance, **kwargs):
+    # До удаления: потом у постов группы уже будет group_id = NULL.
+    counters.clear(counters.GROUP_POSTS, instance.pk)
+    versions.bump_on_commit(*_group_scopes(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def on_comment_saved(sender, instance, created, **kwargs):
+    versions.bump_on_commit(versions.post(instance.post_id))
+    if created:
+        counters.add((counters.POST_COMMENTS, instance.post_id, 1))
+
+
+@receiver(post_delete, sender=Comment)
+def on_comment_deleted(sender, instance, **kwargs):
+    versions.bump_on_commit(versions.post(instance.post_id))
+    counters.add((counters.POST_COMMENTS, instance.post_id, -1))
+
+
+@receiver(post_save, sender=Follow)
+def on_follow_saved(sender, instance, created, **kwargs):
+    versions.bump_on_commit(
+        versions.author(instance.author_id),
+        versions.author(instance.user_id),
+    )
+    if created:
+        counters.add(
+            (counters.FOLLOWERS, instance.author_id, 1),
+            (counters.FOLLOWING, instance.user_id, 1),
+        )
+        timeline.backfill.delay(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def on_follow_deleted(sender, instance, **kwargs):
+    versions.bump_on_commit(
+        versions.author(instance.author_id),
+        versions.author(instance.user_id),
+    )
+    counters.add(
+        (counters.FOLLOWERS, instance.author_id, -1),
+        (counters.FOLLOWING, instance.user_id, -1),
+    )
+    timeline.trim.delay(instance.user_id, instance.author_id)
+    # Автор мог опуститься ниже порога: тогда его посты нужно разложить
+    # по лентам оставшихся подписчиков. Счетчик мог еще не учесть эту
+    # отписку, поэтому берется запас в единицу; лишний settle ничего
+    # не делает.
+    followers = counters.get(counters.FOLLOWERS, instance.author_id)
+    if followers >= settings.TIMELINE_PULL_THRESHOLD - 1:
+        timeline.settle.delay(
+            instance.author_id, key=f'timeline:settle:{instance.author_id}'
+        )
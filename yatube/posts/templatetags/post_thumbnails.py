@@ -0,0 +1,18 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Заранее находит миниатюры всех постов страницы одним запросом."""
+    thumbnails.attach(posts)
+    return ''
+
+
+@register.simple_tag
+def post_thumbnail(post):
+    """Варианты картинки карточки (Card) или None, пока их нет."""
+    return thumbnails.card(post)
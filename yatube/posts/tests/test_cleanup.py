@@ -0,0 +1,86 @@
+import os
+import shutil
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.template.defaultfilters import filesizeformat
+
+from posts import cleanup, thumbnails
+from posts.models import Post, User
+from posts.tests.utils import TEMP_MEDIA_ROOT, MediaTestCase, make_image
+
+
+class CleanMediaTest(MediaTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.author = User.objects.create_user(username='media_author')
+        self.live = self.create_post('red')
+        orphan = self.create_post('blue')
+        self.orphan_name = orphan.image.name
+        self.orphan_thumbnails = cleanup.image_thumbnails(self.orphan_name)
+        orphan.delete()
+        self.stray = default_storage.save(
+            'cache/00/00/stray.jpg', ContentFile(b'x' * 10))
+
+    def create_post(self, color):
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=make_image(color=color))
+        thumbnails.generate(post.image.name, post.pk)
+        return post
+
+    def clean(self, *args):
+        output = StringIO()
+        call_command('clean_media', '--min-age=0', '--pause=0', *args,
+                     stdout=output)
+        return output.getvalue()
+
+    def assertExists(self, name, exists=True):
+        self.assertEqual(default_storage.exists(name), exists, name)
+
+    def test_dry_run_reports_without_deleting(self):
+        """Пробный запуск считает место и ничего не удаляет"""
+        size = (
+            default_storage.size(self.orphan_name) + 10
+            + sum(size for _, size in self.orphan_thumbnails)
+        )
+        output = self.clean('--dry-run')
+        files = len(self.orphan_thumbnails) + 2
+        self.assertIn(
+            f'Можно освободить: {filesizeformat(size)} в {files} файлах',
+            output)
+        self.assertExists(self.orphan_name)
+        self.assertExists(self.stray)
+
+    def test_orphans_deleted(self):
+        """Удаляются картинки без постов, их миниатюры и лишние миниатюры"""
+        self.clean()
+        self.assertExists(self.orphan_name, False)
+        for name, _ in self.orphan_thumbnails:
+            self.assertExists(name, False)
+        self.assertExists(self.stray, False)
+        self.assertExists(self.live.image.name)
+        live_thumbnails = cleanup.image_thumbnails(self.live.image.name)
+        self.assertTrue(live_thumbnails)
+        for name, _ in live_thumbnails:
+            self.assertExists(name)
+
+    def test_thumbnails_of_removed_source_deleted(self):
+        """Миниатюры удаленного исходника без поста удаляются"""
+        old_name = self.live.image.name
+        old_thumbnails = cleanup.image_thumbnails(old_name)
+        Post.objects.filter(pk=self.live.pk).update(image='')
+        os.remove(os.path.join(TEMP_MEDIA_ROOT, old_name))
+        self.clean()
+        for name, _ in old_thumbnails:
+            self.assertExists(name, False)
+        self.assertEqual(cleanup.image_thumbnails(old_name), [])
+
+    def test_recent_files_kept(self):
+        """Свежие файлы не трогаются"""
+        call_command('clean_media', '--pause=0', stdout=StringIO())
+        self.assertExists(self.orphan_name)
+        self.assertExists(self.stray)
@@ -0,0 +1,152 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import tasks
+from posts import conditional, versions
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='etag_author')
+        self.reader = User.objects.create_user(username='etag_reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='etag_group', description='Описание')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:index_list'),
+            'group': reverse('posts:group_list',
+                             kwargs={'slug': 'etag_group'}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': 'etag_author'}),
+            'post': reverse('posts:post_detail',
+                            kwargs={'post_id': self.post.pk}),
+        }
+
+    def revalidate(self, url, response):
+        headers = {'HTTP_IF_NONE_MATCH': response['ETag']}
+        if response.has_header('Last-Modified'):
+            headers['HTTP_IF_MODIFIED_SINCE'] = response['Last-Modified']
+        return self.client.get(url, **headers)
+
+    @mock.patch.object(conditional, 'LAST_MODIFIED_MIN_AGE', 0)
+    def test_not_modified_without_feed_queries(self):
+        """Неизменная страница отдает 304 без запросов ленты"""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Last-Modified', response)
+                with CaptureQueriesContext(connection) as queries:
+                    again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertFalse(any(
+                    'FROM "posts_post"' in query['sql']
+                    and 'LIMIT 1' not in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    def test_writes_change_validators(self):
+        """Новые посты, комментарии и подписки меняют ETag"""
+        first = {
+            name: self.client.get(url) for name, url in self.urls.items()
+        }
+        Post.objects.create(author=self.author, group=self.group, text='Еще')
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.revalidate(url, first[name])
+                self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_waits_for_a_second(self):
+        """Last-Modified отдается, когда правке больше секунды"""
+        url = self.urls['post']
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        later = versions.now() + conditional.LAST_MODIFIED_MIN_AGE
+        with mock.patch.object(versions, 'now', return_value=later):
+            response = self.client.get(url)
+            self.assertTrue(response.has_header('Last-Modified'))
+            again = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_author_rename_changes_pages(self):
+        """Новое имя автора сразу видно в лентах, группе и профиле"""
+        first = {
+            name: self.client.get(url) for name, url in self.urls.items()
+        }
+        self.author.last_login = timezone.now()
+        self.author.save()
+        self.assertEqual(
+            self.revalidate(self.urls['index'], first['index']).status_code,
+            304,
+        )
+        self.author.first_name = 'Переименованный'
+        self.author.save()
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.revalidate(url, first[name])
+                self.assertContains(response, 'Переименованный')
+
+    def test_group_rename_changes_pages(self):
+        """Правка группы сразу видна на всех страницах с ее постом"""
+        first = {
+            name: self.client.get(url) for name, url in self.urls.items()
+        }
+        self.group.title = 'Новая группа'
+        self.group.slug = 'new_group'
+        self.group.save()
+        for name in ('index', 'profile', 'post'):
+            with self.subTest(page=name):
+                response = self.revalidate(self.urls[name], first[name])
+                self.assertEqual(response.status_code, 200)
+        for name in ('index', 'profile'):
+            self.assertContains(
+                self.client.get(self.urls[name]),
+                reverse('posts:group_list', kwargs={'slug': 'new_group'}),
+            )
+
+    def test_etag_depends_on_user_and_cursor(self):
+        url = self.urls['index']
+        response = self.client.get(url)
+        self.assertEqual(
+            Client().get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            .status_code, 200)
+        self.assertEqual(
+            self.client.get(url, {'cursor': 'x'},
+                            HTTP_IF_NONE_MATCH=response['ETag'])
+            .status_code, 200)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_worker_changes_validators(self):
+        """Счетчики и ленты, обновленные воркером, меняют ETag"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Из очереди')
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        pages = ('index', 'profile', 'post')
+        first = {name: self.client.get(self.urls[name]) for name in pages}
+        self.assertContains(first['profile'], 'Всего постов: 1')
+        tasks.run(tasks.claim(100, 60))
+        for name in pages:
+            with self.subTest(page=name):
+                response = self.revalidate(self.urls[name], first[name])
+                self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            self.client.get(self.urls['profile']), 'Всего постов: 2')
+        self.assertContains(
+            self.client.get(reverse('posts:follow_index')), 'Из очереди')
@@ -0,0 +1,104 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import counters
+from posts.models import Comment, Counter, Follow, Group, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='counter_author')
+        self.reader = User.objects.create_user(username='counter_reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='counter_group', description='Описание'
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа', slug='other_group', description='Описание'
+        )
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счетчики"""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.assertEqual(counters.get(counters.ALL_POSTS), 2)
+        self.assertEqual(
+            counters.get(counters.AUTHOR_POSTS, self.author.pk), 2)
+        self.assertEqual(counters.get(counters.GROUP_POSTS, self.group.pk), 1)
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(counters.get(counters.GROUP_POSTS, self.group.pk), 0)
+        self.assertEqual(
+            counters.get(counters.GROUP_POSTS, self.other_group.pk), 1)
+        post.delete()
+        self.assertEqual(counters.get(counters.ALL_POSTS), 1)
+        self.assertEqual(
+            counters.get(counters.AUTHOR_POSTS, self.author.pk), 1)
+        self.assertEqual(
+            counters.get(counters.GROUP_POSTS, self.other_group.pk), 0)
+
+    def test_deferred_group_not_loaded(self):
+        """Пост без загруженной группы не читает ее и не сбивает счетчик"""
+        Post.objects.create(author=self.author, text='Пост', group=self.group)
+        with self.assertNumQueries(1):
+            post = Post.objects.only('text').get()
+        post.text = 'Правка'
+        post.save()
+        self.assertEqual(counters.get(counters.GROUP_POSTS, self.group.pk), 1)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки меняют счетчики"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        self.assertEqual(counters.get(counters.POST_COMMENTS, post.pk), 1)
+        comment.delete()
+        self.assertEqual(counters.get(counters.POST_COMMENTS, post.pk), 0)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(counters.get(counters.FOLLOWERS, self.author.pk), 1)
+        self.assertEqual(counters.get(counters.FOLLOWING, self.reader.pk), 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(counters.get(counters.FOLLOWERS, self.author.pk), 0)
+
+    def test_reconcile_repairs_drift(self):
+        """Команда reconcile_counters чинит расхождения"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {i}', group=self.group)
+            for i in range(3)
+        ])
+        Counter.objects.create(name=counters.FOLLOWERS, object_id=999,
+                               value=5)
+        out = StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn('Найдено расхождений: 4', out.getvalue())
+        self.assertEqual(counters.get(counters.ALL_POSTS), 0)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(counters.get(counters.ALL_POSTS), 3)
+        self.assertEqual(
+            counters.get(counters.AUTHOR_POSTS, self.author.pk), 3)
+        self.assertEqual(counters.get(counters.GROUP_POSTS, self.group.pk), 3)
+        self.assertEqual(counters.get(counters.FOLLOWERS, 999), 0)
+        self.assertEqual(counters.reconcile(), [])
+
+    def test_views_read_counters(self):
+        """Профиль и пост берут число постов из счетчиков"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Counter.objects.filter(
+            name=counters.AUTHOR_POSTS, object_id=self.author.pk
+        ).update(value=42)
+        client = Client()
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': 'counter_author'}))
+        self.assertEqual(response.context['post_count'], 42)
+        self.assertEqual(response.context['page_obj'].paginator.count, 42)
+        response = client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertEqual(response.context['post_count'], 42)
@@ -0,0 +1,112 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+def parse(content):
+    return [json.loads(line) for line in content.decode().splitlines()]
+
+
+class ExportContentTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='export_author')
+        self.other = User.objects.create_user(username='export_other')
+        group = Group.objects.create(
+            title='Группа', slug='export_group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}',
+                                group=group)
+            for number in range(3)
+        ]
+        self.other_post = Post.objects.create(
+            author=self.other, text='Чужой пост'
+        )
+        self.comment = Comment.objects.create(
+            post=self.other_post, author=self.author, text='Комментарий'
+        )
+        Comment.objects.create(
+            post=self.posts[0], author=self.other, text='Чужой комментарий'
+        )
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def export(self, *args):
+        descriptor, path = tempfile.mkstemp()
+        os.close(descriptor)
+        self.addCleanup(os.remove, path)
+        call_command(
+            'export_content', f'--output={path}', '--batch-size=2', *args,
+            stdout=StringIO()
+        )
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def test_command_exports_everything_by_pk(self):
+        """Команда выгружает посты и комментарии по возрастанию id"""
+        records = parse(self.export())
+        self.assertEqual(
+            [(record['type'], record['id']) for record in records],
+            [('post', post.pk) for post in self.posts]
+            + [('post', self.other_post.pk)]
+            + [('comment', pk) for pk in Comment.objects.order_by(
+                'pk').values_list('pk', flat=True)],
+        )
+        first = records[0]
+        self.assertEqual(first['author'], 'export_author')
+        self.assertEqual(first['group'], 'export_group')
+        self.assertEqual(first['text'], 'Пост 0')
+        self.assertEqual(
+            parse_datetime(first['pub_date']),
+            self.posts[0].pub_date.replace(
+                microsecond=self.posts[0].pub_date.microsecond // 1000 * 1000
+            ),
+        )
+
+    def test_command_gzip_and_author(self):
+        """--gzip сжимает выгрузку, --author оставляет данные автора"""
+        records = parse(gzip.decompress(
+            self.export('--gzip', '--author=export_author')
+        ))
+        self.assertEqual(len(records), 4)
+        self.assertTrue(
+            all(record['author'] == 'export_author' for record in records)
+        )
+
+    def test_endpoint_streams_own_content(self):
+        """Пользователь скачивает только свои посты и комментарии"""
+        response = self.client.get(reverse('posts:export'))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(response.streaming)
+        records = parse(b''.join(response.streaming_content))
+        self.assertEqual(
+            [(record['type'], record['id']) for record in records],
+            [('post', post.pk) for post in self.posts]
+            + [('comment', self.comment.pk)],
+        )
+
+    def test_endpoint_gzip(self):
+        """С ?gzip=1 выгрузка сжимается на лету"""
+        response = self.client.get(reverse('posts:export'), {'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.ndjson.gz', response['Content-Disposition'])
+        records = parse(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(len(records), 4)
+
+    def test_endpoint_requires_login(self):
+        """Аноним отправляется на страницу входа"""
+        response = Client().get(reverse('posts:export'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('users:login'), response.url)
@@ -1,14 +1,18 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.models import Comment, Group, Post, User
 
+UPLOAD_MEDIA_ROOT = tempfile.mkdtemp()
+
 
 class PostCreateFormTests(TestCase):
     @classmethod
@@ -144,6 +148,54 @@ class PostCreateFormTests(TestCase):
         self.assertFormError(response, 'form', 'image', err)
 
 
+@override_settings(MEDIA_ROOT=UPLOAD_MEDIA_ROOT)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(UPLOAD_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, size, format_='JPEG'):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'green').save(buffer, format_)
+        image = SimpleUploadedFile(
+            f'picture.{format_.lower()}', buffer.getvalue(),
+            f'image/{format_.lower()}')
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост с картинкой', 'image': image})
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=100)
+    def test_too_large_file_rejected(self):
+        """Файл больше лимита отклоняется"""
+        response = self.upload((64, 64), 'PNG')
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 100\xa0байт.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=10 ** 6)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с лишними мегапикселями отклоняется по заголовку"""
+        response = self.upload((2000, 1000))
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 1 мегапикселей.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_SIDE=32)
+    def test_large_image_downscaled(self):
+        """Большая картинка уменьшается до предельной стороны"""
+        self.upload((200, 100))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (32, 16))
+            self.assertEqual(image.format, 'JPEG')
+
+
 class CommentFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -0,0 +1,107 @@
+import hashlib
+import os
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post, User
+from posts.tests.utils import TEMP_MEDIA_ROOT, MediaTestCase, image_content
+
+
+class ImageMetadataTest(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='image_author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='picture.png'):
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content, 'image/png'),
+        })
+        return Post.objects.latest('pk')
+
+    def test_metadata_filled_on_upload(self):
+        """При загрузке сохраняются размеры, вес и хэш картинки"""
+        content = image_content()
+        post = self.upload(content)
+        self.assertEqual((post.image_width, post.image_height), (40, 20))
+        self.assertEqual(post.image_size, len(content))
+        self.assertEqual(post.image_hash, hashlib.sha256(content).hexdigest())
+        os.remove(post.image.path)
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual((post.image_width, post.image_height), (40, 20))
+
+    def test_upload_path_sharded_by_hash(self):
+        """Файл сохраняется в каталог по хэшу содержимого"""
+        content = image_content()
+        image_hash = hashlib.sha256(content).hexdigest()
+        post = self.upload(content, 'Picture.PNG')
+        self.assertEqual(
+            post.image.name,
+            f'posts/{image_hash[:2]}/{image_hash[2:4]}/{image_hash}.png')
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки хранятся одним файлом"""
+        content = image_content()
+        first = self.upload(content, 'first.png')
+        second = self.upload(content, 'second.png')
+        third = self.upload(image_content(color='blue'), 'first.png')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertNotEqual(third.image.name, first.image.name)
+        stored = os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        self.assertFalse([name for name in stored
+                          if name.startswith('second')])
+
+    def test_backfill_command(self):
+        """Команда заполняет метаданные у старых постов"""
+        content = image_content(size=(30, 10))
+        post = self.upload(content)
+        Post.objects.update(
+            image_width=None, image_height=None, image_size=None,
+            image_hash='')
+        output = StringIO()
+        call_command('fill_image_metadata', batch_size=1, stdout=output)
+        self.assertIn('Заполнено постов: 1', output.getvalue())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (30, 10))
+        self.assertEqual(post.image_size, len(content))
+        self.assertEqual(post.image_hash, hashlib.sha256(content).hexdigest())
+
+    def test_shard_media_command(self):
+        """Команда переносит старые файлы в каталоги по хэшу"""
+        content = image_content(size=(20, 20))
+        image_hash = hashlib.sha256(content).hexdigest()
+        legacy = default_storage.save('posts/legacy.png',
+                                      ContentFile(content))
+        posts = [
+            Post.objects.create(author=self.user, text=f'Пост {i}',
+                                image=legacy)
+            for i in range(2)
+        ]
+        output = StringIO()
+        with mock.patch.object(thumbnails.generate, 'delay_many') as submit:
+            call_command('shard_media', batch_size=1, stdout=output)
+        self.assertIn('Перенесено постов: 2', output.getvalue())
+        self.assertFalse(default_storage.exists(legacy))
+        for post in posts:
+            post.refresh_from_db()
+            self.assertEqual(
+                post.image.name,
+                f'posts/{image_hash[:2]}/{image_hash[2:4]}/{image_hash}.png')
+            self.assertEqual(post.image_hash, image_hash)
+        with open(posts[0].image.path, 'rb') as file:
+            self.assertEqual(file.read(), content)
+        queued = [
+            args for call in submit.call_args_list for args, _ in call[0][0]
+        ]
+        # Оба поста ссылались на один файл: хватает одной задачи.
+        self.assertEqual(queued, [(posts[0].image.name, posts[0].pk)])
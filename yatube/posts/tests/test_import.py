@@ -0,0 +1,183 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from posts import counters, importer, versions
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+from posts.search import SearchResults
+
+User = get_user_model()
+
+
+def write_file(test, suffix, content):
+    descriptor, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+        file.write(content)
+    test.addCleanup(os.remove, path)
+    return path
+
+
+def jsonl(*rows):
+    return '\n'.join(
+        row if isinstance(row, str) else json.dumps(row, ensure_ascii=False)
+        for row in rows
+    ) + '\n'
+
+
+class ImportContentTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='import_author')
+        self.reader = User.objects.create_user(username='import_reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='import_group', description='Описание'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def run_import(self, path, *args):
+        output = StringIO()
+        call_command(
+            'import_content', path, '--chunk-size=2', '--batch-size=2',
+            *args, stdout=output, stderr=StringIO()
+        )
+        return output.getvalue()
+
+    def test_import_jsonl(self):
+        """Посты, комментарии и подписки импортируются пачками"""
+        path = write_file(self, '.jsonl', jsonl(
+            {'type': 'post', 'id': 'p1', 'author': 'import_author',
+             'text': 'Первый', 'group': 'import_group',
+             'pub_date': '2020-01-02T03:04:05'},
+            {'type': 'post', 'id': 'p2', 'author': 'newcomer',
+             'text': 'Второй'},
+            {'type': 'comment', 'post': 'p1', 'author': 'newcomer',
+             'text': 'Комментарий', 'created': '2020-01-03T00:00:00'},
+            {'type': 'follow', 'user': 'newcomer', 'author': 'import_author'},
+            {'type': 'follow', 'user': 'import_reader',
+             'author': 'import_author'},
+            {'type': 'follow', 'user': 'newcomer', 'author': 'newcomer'},
+            {'type': 'post', 'author': 'import_author', 'text': 'Пост',
+             'group': 'missing'},
+            {'type': 'comment', 'post': 'p9', 'author': 'newcomer',
+             'text': 'Комментарий'},
+            {'type': 'like'},
+            'не json',
+        ))
+        output = self.run_import(path)
+        self.assertIn(
+            'Импортировано постов: 2, комментариев: 1, подписок: 1; '
+            'пропущено строк: 6. 10 строк',
+            output,
+        )
+        newcomer = User.objects.get(username='newcomer')
+        self.assertFalse(newcomer.has_usable_password())
+        first = Post.objects.get(text='Первый')
+        self.assertEqual(first.author, self.author)
+        self.assertEqual(first.group, self.group)
+        self.assertEqual(
+            first.pub_date, timezone.make_aware(datetime(2020, 1, 2, 3, 4, 5))
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, first)
+        self.assertEqual(comment.created.year, 2020)
+        self.assertTrue(
+            Follow.objects.filter(user=newcomer, author=self.author).exists()
+        )
+        self.assertEqual(counters.get(counters.ALL_POSTS), 2)
+        self.assertEqual(
+            counters.get(counters.AUTHOR_POSTS, self.author.pk), 1)
+        self.assertEqual(counters.get(counters.GROUP_POSTS, self.group.pk), 1)
+        self.assertEqual(counters.get(counters.POST_COMMENTS, first.pk), 1)
+        self.assertEqual(counters.get(counters.FOLLOWERS, self.author.pk), 2)
+        self.assertEqual(counters.reconcile(dry_run=True), [])
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user', 'post')),
+            {(self.reader.pk, first.pk), (newcomer.pk, first.pk)},
+        )
+
+    def test_import_csv(self):
+        """CSV читается по заголовку, пустые поля не учитываются"""
+        path = write_file(self, '.csv', (
+            'type,id,author,text,group,post\n'
+            'post,1,import_author,"Текст, с запятой",,\n'
+            'comment,,import_reader,Ответ,,1\n'
+        ))
+        self.run_import(path)
+        post = Post.objects.get()
+        self.assertEqual(post.text, 'Текст, с запятой')
+        self.assertIsNone(post.group)
+        self.assertEqual(Comment.objects.get().post, post)
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=1)
+    def test_pulled_author_not_backfilled(self):
+        """Посты автора над порогом не раскладываются по лентам"""
+        path = write_file(self, '.jsonl', jsonl(
+            {'type': 'post', 'author': 'import_author', 'text': 'Пост'},
+            {'type': 'follow', 'user': 'newcomer', 'author': 'import_author'},
+        ))
+        self.run_import(path)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_no_versions_for_new_posts(self):
+        """Импорт не заводит версии страниц импортированных постов"""
+        cache.clear()
+        path = write_file(self, '.jsonl', jsonl(
+            {'type': 'post', 'author': 'import_author', 'text': 'Пост'},
+        ))
+        self.run_import(path)
+        post = Post.objects.get()
+        self.assertFalse(
+            cache.has_key(versions.VERSION_KEY.format(versions.post(post.pk)))
+        )
+        self.assertTrue(cache.has_key(
+            versions.VERSION_KEY.format(versions.author(self.author.pk))
+        ))
+
+    def test_new_posts_after_import_get_fresh_ids(self):
+        """Импорт не занимает id удаленных постов, а сайт — импортированных"""
+        path = write_file(self, '.jsonl', jsonl(*(
+            {'type': 'post', 'author': 'import_author', 'text': str(number)}
+            for number in range(3)
+        )))
+        deleted_id = Post.objects.create(author=self.author, text='Удален').pk
+        Post.objects.filter(pk=deleted_id).delete()
+        self.run_import(path)
+        imported = set(Post.objects.values_list('pk', flat=True))
+        self.assertGreater(min(imported), deleted_id)
+        post = Post.objects.create(author=self.author, text='После')
+        self.assertGreater(post.pk, max(imported))
+
+
+class DeferredIndexesTest(TransactionTestCase):
+    def test_search_index_rebuilt(self):
+        """После импорта с --defer-indexes поиск находит новые посты"""
+        User.objects.create_user(username='import_author')
+        path = write_file(self, '.jsonl', jsonl(
+            {'type': 'post', 'author': 'import_author',
+             'text': 'Импортированный пост'},
+        ))
+        call_command(
+            'import_content', path, '--defer-indexes', stdout=StringIO()
+        )
+        post = Post.objects.get()
+        self.assertEqual(list(SearchResults('импортированный')), [post])
+
+    def test_search_works_during_import(self):
+        """Пока индексы сняты, поиск по старым постам продолжает работать"""
+        author = User.objects.create_user(username='import_author')
+        old = Post.objects.create(author=author, text='Старый пост')
+        with importer.deferred_indexes():
+            new = Post.objects.create(author=author, text='Новый пост')
+            self.assertEqual(list(SearchResults('старый')), [old])
+            self.assertEqual(list(SearchResults('новый')), [])
+        self.assertEqual(list(SearchResults('новый')), [new])
+        new.text = 'Правка'
+        new.save()
+        self.assertEqual(list(SearchResults('правка')), [new])
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class IndexUsageTest(TestCase):
+    """Запросы страниц не сортируют в памяти и не сканируют таблицы"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='index_author')
+        cls.reader = User.objects.create_user(username='index_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='index_group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(12):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}')
+        Comment.objects.create(post=post, author=cls.reader, text='Ок')
+        cls.post = post
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def query_plans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        return response, plans
+
+    def assert_uses_indexes(self, url, params=None):
+        response, plans = self.query_plans(url, params)
+        self.assertTrue(plans)
+        for sql, plan in plans:
+            for step in plan:
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertNotIn('TEMP B-TREE', step)
+                    if 'posts_' in step:
+                        self.assertIn('USING', step)
+        return response
+
+    def test_views_use_indexes(self):
+        urls = (
+            reverse('posts:index_list'),
+            reverse('posts:group_list', kwargs={'slug': 'index_group'}),
+            reverse('posts:profile', kwargs={'username': 'index_author'}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            response = self.assert_uses_indexes(url)
+            page_obj = response.context.get('page_obj')
+            if page_obj is not None and page_obj.next_cursor:
+                self.assert_uses_indexes(
+                    url, {'cursor': page_obj.next_cursor})
+
+    def test_follow_is_unique(self):
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.reader, author=self.author)
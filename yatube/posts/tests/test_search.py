@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Group, Post
+from posts.search import SearchResults, fts_enabled
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='search_author', first_name='Лев', last_name='Толстой')
+        self.group = Group.objects.create(
+            title='Классика', slug='classics', description='Описание')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group,
+            text='Все счастливые семьи похожи друг на друга')
+        self.other = Post.objects.create(
+            author=User.objects.create_user(username='other_author'),
+            text='Мой дядя самых честных правил')
+        self.client = Client()
+
+    def found(self, query):
+        return [post.pk for post in SearchResults(query)[:100]]
+
+    def test_fts_index_exists(self):
+        self.assertTrue(fts_enabled())
+
+    def test_search_text_group_and_author(self):
+        """Ищет по тексту, группе и автору, с учетом префикса"""
+        self.assertEqual(self.found('счастлив'), [self.post.pk])
+        self.assertEqual(self.found('классика'), [self.post.pk])
+        self.assertEqual(self.found('Толстой'), [self.post.pk])
+        self.assertEqual(self.found('дядя правил'), [self.other.pk])
+        self.assertEqual(self.found('"* OR NEAR('), [])
+
+    def test_index_follows_changes(self):
+        """Правки постов, групп и авторов попадают в индекс"""
+        self.post.text = 'Анна Каренина'
+        self.post.save()
+        self.assertEqual(self.found('счастливые'), [])
+        self.assertEqual(self.found('каренина'), [self.post.pk])
+        Group.objects.filter(pk=self.group.pk).update(title='Романы')
+        self.assertEqual(self.found('романы'), [self.post.pk])
+        self.author.last_name = 'Толстой-Старший'
+        self.author.save()
+        self.assertEqual(self.found('старший'), [self.post.pk])
+        self.post.delete()
+        self.assertEqual(self.found('каренина'), [])
+
+    def test_login_does_not_reindex_author(self):
+        """Сохранение автора без смены имени не трогает индекс"""
+        def changes():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT total_changes()')
+                return cursor.fetchone()[0]
+
+        before = changes()
+        self.author.last_login = timezone.now()
+        self.author.save()
+        # total_changes() учитывает и строки, измененные триггерами.
+        self.assertEqual(changes() - before, 1)
+
+    def test_ranked_and_paginated(self):
+        """Лучшее совпадение первым, выдача разбита на страницы"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'правил {i}') for i in range(11)
+        ])
+        best = Post.objects.create(
+            author=self.author, text='правил правил правил правил')
+        response = self.client.get(reverse('posts:search'), {'q': 'правил'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 13)
+        self.assertEqual(page_obj[0], best)
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'правил', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'Толстой'})
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.post.pk]
+        )
@@ -0,0 +1,124 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import thumbnails, versions
+from posts.models import Post
+from posts.tests.utils import MediaTestCase, make_image
+
+User = get_user_model()
+
+
+@mock.patch('posts.thumbnails._submit')
+class ThumbnailPipelineTest(MediaTestCase):
+    def setUp(self):
+        # Имена файлов зависят от содержимого, а записи sorl в кэше
+        # переживают откат БД между тестами.
+        cache.clear()
+        self.author = User.objects.create_user(username='thumb_author')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_create_and_edit_schedule_thumbnails(self, submit):
+        """Создание и замена картинки ставят миниатюры в очередь"""
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Пост', 'image': make_image()})
+        post = Post.objects.get()
+        submit.assert_called_once_with((post.image.name, post.pk))
+        submit.reset_mock()
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Новый текст'})
+        submit.assert_not_called()
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Новый текст', 'image': make_image('other.png')})
+        post.refresh_from_db()
+        submit.assert_called_once_with((post.image.name, post.pk))
+
+    def test_placeholder_until_generated(self, submit):
+        """До создания миниатюры шаблон показывает заглушку"""
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=make_image())
+        url = reverse('posts:index_list')
+        response = self.client.get(url)
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        # Чтение страницы ничего не ставит в очередь.
+        submit.assert_not_called()
+        thumbnails.generate(post.image.name, post.pk)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'aspect-ratio: 960 / 339')
+        self.assertContains(response, '<img class="card-img my-2" src="')
+        self.assertContains(response, 'srcset="')
+
+    def test_generate_refreshes_posts_sharing_file(self, submit):
+        """Готовые миниатюры меняют версии всех постов с общим файлом"""
+        first, second = [
+            Post.objects.create(
+                author=self.author, text='Пост', image=make_image())
+            for _ in range(2)
+        ]
+        self.assertEqual(first.image.name, second.image.name)
+        before = versions.get(versions.post(second.pk))
+        thumbnails.generate(first.image.name, first.pk)
+        self.assertGreater(versions.get(versions.post(second.pk)), before)
+
+    def test_page_thumbnails_fetched_in_one_query(self, submit):
+        """Миниатюры всей страницы читаются из хранилища одним запросом"""
+        posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {i}',
+                image=make_image(f'picture{i}.png'))
+            for i in range(3)
+        ]
+        for post in posts:
+            thumbnails.generate(post.image.name, post.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index_list'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertNotContains(response, 'aspect-ratio: 960 / 339')
+        for post in response.context['page_obj']:
+            self.assertEqual(
+                (post.card_thumbnail.width, post.card_thumbnail.height),
+                (960, 339),
+            )
+        submit.assert_not_called()
+
+    def test_card_markup(self, submit):
+        """Карточка выводит srcset всех ширин, размеры и lazy-загрузку"""
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=make_image())
+        thumbnails.generate(post.image.name, post.pk)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        card = response.context['post'].card_thumbnail
+        for width in thumbnails.CARD_WIDTHS:
+            self.assertIn(f' {width}w', card.srcset)
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+        modern = [mime for format_, mime in thumbnails.card_formats()
+                  if format_ != 'JPEG']
+        self.assertEqual([mime for mime, _ in card.sources], modern)
+
+    def test_generate_thumbnails_command(self, submit):
+        """Команда создает варианты для уже загруженных картинок"""
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=make_image())
+        self.assertIsNone(thumbnails.card(Post.objects.get(pk=post.pk)))
+        output = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=output)
+        self.assertIn('Обработано картинок: 1, с ошибками: 0',
+                      output.getvalue())
+        self.assertIsNotNone(thumbnails.card(Post.objects.get(pk=post.pk)))
@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='timeline_author')
+        self.reader = User.objects.create_user(username='timeline_reader')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def timeline_posts(self):
+        return list(
+            TimelineEntry.objects.filter(user=self.reader)
+            .values_list('post_id', flat=True)
+        )
+
+    @override_settings(TIMELINE_BATCH_SIZE=2)
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты всех подписчиков"""
+        followers = [
+            User.objects.create_user(username=f'follower_{i}')
+            for i in range(5)
+        ]
+        for follower in followers:
+            Follow.objects.create(user=follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=post).count(), len(followers))
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=2)
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка добавляет последние посты, отписка убирает их"""
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': 'timeline_author'}))
+        self.assertCountEqual(
+            self.timeline_posts(), [posts[2].pk, posts[1].pk])
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': 'timeline_author'}))
+        self.assertEqual(self.timeline_posts(), [])
+
+    def test_follow_index_reads_timeline(self):
+        """Лента подписок читается из timeline без join с подписками"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:follow_index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertEqual(page_obj[0].text, 'Пост 11')
+        self.assertFalse(any(
+            'posts_follow' in query['sql'] and 'posts_post' in query['sql']
+            for query in queries.captured_queries
+        ))
+        response = self.client.get(
+            reverse('posts:follow_index'), {'cursor': page_obj.next_cursor})
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Пост 1', 'Пост 0']
+        )
+
+
+@override_settings(TIMELINE_PULL_THRESHOLD=2, TIMELINE_PULL_LIMIT=3)
+class HybridTimelineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='hybrid_reader')
+        self.star = User.objects.create_user(username='hybrid_star')
+        self.author = User.objects.create_user(username='hybrid_author')
+        fan = User.objects.create_user(username='hybrid_fan')
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=fan, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(15):
+            Post.objects.create(
+                author=self.star if i % 2 else self.author,
+                text=f'Пост {i}'
+            )
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_popular_author_is_not_fanned_out(self):
+        """Посты автора над порогом не раскладываются по лентам"""
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists())
+        self.assertEqual(
+            TimelineEntry.objects.filter(author=self.author).count(), 8)
+
+    def test_feed_merges_pulled_and_pushed_posts(self):
+        """Лента сливает обе стратегии без пропусков в обе стороны"""
+        url = reverse('posts:follow_index')
+        pages = [self.client.get(url).context['page_obj']]
+        while pages[-1].next_cursor:
+            pages.append(self.client.get(
+                url, {'cursor': pages[-1].next_cursor}).context['page_obj'])
+        seen = [post.pk for page_obj in pages for post in page_obj]
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+        back = self.client.get(
+            url, {'cursor': pages[-1].previous_cursor}).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in pages[0]])
+
+    def test_author_below_threshold_is_fanned_out(self):
+        """После отписок ниже порога посты автора остаются в лентах"""
+        Follow.objects.filter(author=self.star).exclude(
+            user=self.reader
+        ).delete()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=self.reader, author=self.star
+            ).count(),
+            Post.objects.filter(author=self.star).count(),
+        )
+        self.test_feed_merges_pulled_and_pushed_posts()
+
+    def test_new_post_invalidates_recent_posts_cache(self):
+        """Новый пост автора сбрасывает его кэш последних постов"""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        post = Post.objects.create(author=self.star, text='Свежий пост')
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'][0], post)
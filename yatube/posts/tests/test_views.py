@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -6,10 +7,13 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post
+from posts.images import shard_name
+from posts.models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -34,6 +38,8 @@ class PostTest(TestCase):
             content=small_gif,
             content_type='image/gif'
         )
+        cls.image_name = 'posts/' + shard_name(
+            hashlib.sha256(small_gif).hexdigest(), 'small.gif')
 
         cls.user = User.objects.create_user(username='test_user')
 
@@ -104,7 +110,7 @@ class PostTest(TestCase):
         self.assertEqual(post_text, 'Тестовый пост автора 2')
         self.assertEqual(post_author, 'test_author_2')
         self.assertEqual(post_group, 'Заголовок для тестовой группы 2')
-        self.assertEqual(post_image, 'posts/small.gif')
+        self.assertEqual(post_image, self.image_name)
 
     def test_group_pages_show_correct_context(self):
         """Шаблон group_list получает правильный контекст"""
@@ -114,7 +120,7 @@ class PostTest(TestCase):
         group_title = first_object.title
         group_slug = first_object.slug
         post_image = Post.objects.first().image
-        self.assertEqual(post_image, 'posts/small.gif')
+        self.assertEqual(post_image, self.image_name)
         self.assertEqual(group_title, 'Заголовок для тестовой группы 1')
         self.assertEqual(group_slug, 'test_slug_1')
 
@@ -134,7 +140,7 @@ class PostTest(TestCase):
         post_text = first_object.text
         post_author = first_object.author.username
         post_image = Post.objects.first().image
-        self.assertEqual(post_image, 'posts/small.gif')
+        self.assertEqual(post_image, self.image_name)
         self.assertEqual(post_author, 'test_author_1')
         self.assertEqual(post_text, 'Тестовый пост автора 1')
 
@@ -146,7 +152,7 @@ class PostTest(TestCase):
         post_text = first_object.text
         post_id = first_object.id
         post_image = Post.objects.first().image
-        self.assertEqual(post_image, 'posts/small.gif')
+        self.assertEqual(post_image, self.image_name)
         self.assertEqual(post_text, 'Тестовый пост автора 1')
         self.assertEqual(post_id, 101)
 
@@ -230,6 +236,147 @@ class PaginatorViewsTest(TestCase):
                 len(response.context.get('page_obj').object_list), 3)
 
 
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='cursor_author')
+        Post.objects.bulk_create([
+            Post(text=f'Пост {i}', author=cls.user_author)
+            for i in range(25)
+        ])
+        cls.url = reverse('posts:profile',
+                          kwargs={'username': 'cursor_author'})
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def get_page(self, params=None):
+        response = self.guest_client.get(self.url, params or {})
+        return response.context['page_obj']
+
+    def test_cursor_walks_feed_without_gaps(self):
+        """Ссылки «старше» обходят ленту без пропусков и повторов"""
+        seen = []
+        page_obj = self.get_page()
+        self.assertEqual(page_obj.previous_cursor, '')
+        while True:
+            seen.extend(post.pk for post in page_obj)
+            if not page_obj.next_cursor:
+                break
+            page_obj = self.get_page({'cursor': page_obj.next_cursor})
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_newer_cursor_returns_previous_page(self):
+        """Ссылка «новее» возвращает предыдущую страницу"""
+        first = self.get_page()
+        second = self.get_page({'cursor': first.next_cursor})
+        third = self.get_page({'cursor': second.next_cursor})
+        back = self.get_page({'cursor': third.previous_cursor})
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in second]
+        )
+        self.assertEqual(len(third.object_list), 5)
+
+    def test_legacy_page_number(self):
+        """Старые ссылки ?page=N продолжают работать"""
+        second = self.get_page({'page': 2})
+        first = self.get_page()
+        by_cursor = self.get_page({'cursor': first.next_cursor})
+        self.assertEqual(
+            [post.pk for post in second], [post.pk for post in by_cursor]
+        )
+        self.assertTrue(second.previous_cursor)
+        self.assertTrue(second.next_cursor)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый токен дает первую страницу"""
+        page_obj = self.get_page({'cursor': 'not-a-cursor'})
+        self.assertEqual(
+            [post.pk for post in page_obj],
+            [post.pk for post in self.get_page()]
+        )
+
+    def test_no_count_query(self):
+        """Пагинатор не считает всю таблицу"""
+        url = reverse('posts:index_list')
+        first = self.guest_client.get(url).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url, {'cursor': first.next_cursor})
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] and 'posts_post' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+
+@override_settings(COMMENTS_PER_PAGE=4)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='comment_author')
+        cls.post = Post.objects.create(text='Пост', author=author)
+        Comment.objects.bulk_create([
+            Comment(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader_{i}'),
+                text=f'Комментарий {i}',
+            )
+            for i in range(10)
+        ])
+        cls.expected = list(
+            Comment.objects.order_by('created', 'id')
+            .values_list('pk', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста первые комментарии, авторы читаются join"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in comments], self.expected[:4]
+        )
+        self.assertContains(response, 'Показать еще комментарии')
+        fragment = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk}
+        )
+        # Версии, проверка поста и одна выборка комментариев с авторами.
+        with self.assertNumQueries(3):
+            self.guest_client.get(fragment, {'cursor': comments.next_cursor})
+
+    def test_fragment_loads_the_rest(self):
+        """«Показать еще» отдает следующие страницы до конца"""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        seen = [comment.pk for comment in comments]
+        while comments.next_cursor:
+            response = self.guest_client.get(
+                url, {'cursor': comments.next_cursor}
+            )
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            comments = response.context['comments']
+            seen += [comment.pk for comment in comments]
+        self.assertEqual(seen, self.expected)
+        self.assertNotContains(response, 'Показать еще комментарии')
+
+    def test_fragment_for_missing_post(self):
+        """Фрагмент несуществующего поста — 404"""
+        url = reverse('posts:post_comments', kwargs={'post_id': 0})
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+
 class CacheTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -241,6 +388,7 @@ class CacheTest(TestCase):
             text='Тестовая запись для создания поста')
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='mob2556')
         self.authorized_client = Client()
@@ -249,15 +397,31 @@ class CacheTest(TestCase):
     def test_cache_index(self):
         """Тест кэширования страницы index.html"""
         first_state = self.authorized_client.get(reverse('posts:index_list'))
-        post_1 = Post.objects.get(pk=1)
-        post_1.text = 'Измененный текст'
-        post_1.save()
+        Post.objects.filter(pk=self.post.pk).update(text='Измененный текст')
         second_state = self.authorized_client.get(reverse('posts:index_list'))
         self.assertEqual(first_state.content, second_state.content)
         cache.clear()
         third_state = self.authorized_client.get(reverse('posts:index_list'))
         self.assertNotEqual(first_state.content, third_state.content)
 
+    def test_post_write_invalidates_index(self):
+        """Правка и новый пост сразу видны на главной"""
+        url = reverse('posts:index_list')
+        self.authorized_client.get(url)
+        self.post.text = 'Измененный текст'
+        self.post.save()
+        self.assertContains(self.authorized_client.get(url),
+                            'Измененный текст')
+        Post.objects.create(author=self.user, text='Совсем новый пост')
+        self.assertContains(self.authorized_client.get(url),
+                            'Совсем новый пост')
+
+    def test_follow_and_index_fragments_are_separate(self):
+        """Лента подписок не получает фрагмент главной страницы"""
+        self.authorized_client.get(reverse('posts:index_list'))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, self.post.text)
+
 
 class FollowTest(TestCase):
     def setUp(self):
@@ -0,0 +1,31 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_content(size=(40, 20), color='red'):
+    """Байты картинки PNG."""
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def make_image(name='picture.png', size=(40, 20), color='red'):
+    """Загруженный файл с картинкой PNG для поля image."""
+    return SimpleUploadedFile(name, image_content(size, color), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaTestCase(TestCase):
+    """TestCase, чьи файлы пишутся во временный MEDIA_ROOT."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
@@ -0,0 +1,221 @@
+from collections import defaultdict, namedtuple
+
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    KVStore as CachedDbKVStore
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import tasks, timing
+
+from . import versions
+from .models import Post
+
+# Варианты картинки в карточке поста для srcset. JPEG — запасной формат
+# для всех браузеров, остальные создаются, если их умеет сохранять Pillow.
+CARD_WIDTHS = (480, 720, 960)
+CARD_RATIO = 339 / 960
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+CARD_FORMATS = (
+    ('AVIF', 'image/avif'),
+    ('WEBP', 'image/webp'),
+    ('JPEG', 'image/jpeg'),
+)
+
+# sorl знает расширения только для JPEG, PNG, GIF и WEBP.
+EXTENSIONS.setdefault('AVIF', 'avif')
+
+Card = namedtuple('Card', 'src srcset width height sources')
+
+
+class CachedThumbnailBackend(ThumbnailBackend):
+    """Ищет готовые миниатюры в хранилище sorl, не создавая их."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile будущей миниатюры; хранилища не трогает."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_cached_many(self, sizes):
+        """Готовые миниатюры для (файл, геометрия, опции); None — еще нет.
+
+        Хранилище sorl читается одним get_many к кэшу и одним запросом
+        к таблице KVStore для промахов кэша.
+        """
+        keys = [
+            add_prefix(self.thumbnail_file(file_, geometry, **options).key)
+            for file_, geometry, options in sizes
+        ]
+        values = _kvstore_get_many(keys)
+        return [
+            deserialize_image_file(values[key]) if key in values else None
+            for key in keys
+        ]
+
+
+def _kvstore_get_many(keys):
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbKVStore):
+        values = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in values.items() if value}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in set(keys) if key not in values]
+    if missing:
+        found = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        # Как и sorl, запоминаем отсутствие ключа, чтобы не ходить в БД.
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(fetched)
+    return {
+        key: value for key, value in values.items() if value != EMPTY_VALUE
+    }
+
+
+backend = CachedThumbnailBackend()
+
+
+def card_formats():
+    """Форматы карточки, которые умеет сохранять установленный Pillow."""
+    Image.init()
+    return [(format_, mime) for format_, mime in CARD_FORMATS
+            if format_ in Image.SAVE]
+
+
+def card_sizes():
+    """(формат, ширина, геометрия, опции) для всех вариантов карточки."""
+    return [
+        (format_, width, f'{width}x{round(width * CARD_RATIO)}',
+         {**CARD_OPTIONS, 'format': format_})
+        for format_, _ in card_formats()
+        for width in CARD_WIDTHS
+    ]
+
+
+def _srcset(variants):
+    return ', '.join(f'{image.url} {width}w' for width, image in variants)
+
+
+def _card(sizes, found):
+    """Card из готовых вариантов или None, пока нет всех JPEG."""
+    by_format = defaultdict(list)
+    for (format_, width, *_), image in zip(sizes, found):
+        by_format[format_].append((width, image))
+    ready = {
+        format_: variants for format_, variants in by_format.items()
+        if all(image is not None for _, image in variants)
+    }
+    if 'JPEG' not in ready:
+        return None
+    _, fallback = ready['JPEG'][-1]
+    return Card(
+        src=fallback.url,
+        srcset=_srcset(ready['JPEG']),
+        width=fallback.width,
+        height=fallback.height,
+        sources=[
+            (mime, _srcset(ready[format_]))
+            for format_, mime in card_formats()
+            if format_ != 'JPEG' and format_ in ready
+        ],
+    )
+
+
+@tasks.task
+def generate(name, post_id=None):
+    """Создает все варианты карточки для файла картинки.
+
+    После создания меняет версии постов с этим файлом, чтобы
+    закэшированные фрагменты с заглушкой перестали отдаваться.
+    """
+    with timing.measure('thumb'):
+        for *_, geometry, options in card_sizes():
+            get_thumbnail(name, geometry, **options)
+    posts = Post.objects.filter(pk=post_id)
+    image_hash = posts.values_list('image_hash', flat=True).first()
+    if image_hash:
+        # Файл по хэшу содержимого бывает общим у нескольких постов.
+        posts = Post.objects.filter(image_hash=image_hash, image=name)
+    scopes = set()
+    for post in posts:
+        scopes.update(versions.for_post(post))
+    versions.bump(*sorted(scopes))
+
+
+def _submit(*items):
+    """Ставит в очередь создание миниатюр для пар (файл, id поста)."""
+    generate.delay_many([
+        ((name, post_id), f'thumbnails:{name}') for name, post_id in items
+    ])
+
+
+def schedule(post):
+    """Ставит создание миниатюр поста в очередь фоновых задач."""
+    if post.image:
+        _submit((post.image.name, post.pk))
+
+
+def attach(posts):
+    """Находит варианты карточек для всех постов страницы разом.
+
+    Результат кладется в post.card_thumbnail (Card или None, если JPEG
+    еще не готовы); его читает тег post_thumbnail. Чтение страницы в БД
+    не пишет: миниатюры ставит в очередь schedule() при сохранении
+    поста, а для старых картинок — команда generate_thumbnails. Посты
+    без готовых вариантов только попадают в замеры core.timing.
+    """
+    posts = [post for post in posts if post.image]
+    if not posts:
+        return
+    timing.count('thumbnails', len(posts))
+    with timing.measure('thumb'):
+        missing = _attach(posts)
+    if missing:
+        timing.count('thumbnails_missing', missing)
+
+
+def _attach(posts):
+    """Заполняет post.card_thumbnail; возвращает число неполных постов."""
+    sizes = card_sizes()
+    found = backend.get_cached_many(
+        (post.image, geometry, options)
+        for post in posts
+        for *_, geometry, options in sizes
+    )
+    missing = 0
+    for index, post in enumerate(posts):
+        variants = found[index * len(sizes):(index + 1) * len(sizes)]
+        post.card_thumbnail = _card(sizes, variants)
+        if any(image is None for image in variants):
+            missing += 1
+    return missing
+
+
+def card(post):
+    """Card карточки поста или None, если миниатюр еще нет."""
+    if not post.image:
+        return None
+    if not hasattr(post, 'card_thumbnail'):
+        attach([post])
+    return post.card_thumbnail
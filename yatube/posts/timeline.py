@@ -0,0 +1,306 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from core import tasks
+
+from . import counters, versions
+from .models import Counter, Follow, Post, TimelineEntry
+from .paginators import CursorPaginator, paginate
+
+RECENT_POSTS_KEY = 'timeline:author:{}'
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def is_pulled(author_id):
+    """Посты авторов с большим числом подписчиков читаются при запросе."""
+    return counters.get(
+        counters.FOLLOWERS, author_id
+    ) >= settings.TIMELINE_PULL_THRESHOLD
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора пачками."""
+    forget_recent_posts(post.author_id)
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    for user_ids in _batches(followers, settings.TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=user_id,
+                    author_id=post.author_id,
+                    post_id=post.pk,
+                    pub_date=post.pub_date,
+                )
+                for user_id in user_ids
+            ],
+            ignore_conflicts=True,
+        )
+        _timelines_changed(user_ids)
+
+
+def _timelines_changed(user_ids):
+    # Лента подписок читателя версионируется областью author:<id>.
+    versions.bump_on_commit(*(versions.author(pk) for pk in user_ids))
+
+
+@tasks.task
+def deliver(post_id):
+    """Фоновая раскладка поста по лентам; удаленный пост пропускается."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        fan_out(post)
+
+
+def pulled_among(author_ids):
+    """Авторы из author_ids, чьи посты читаются при запросе."""
+    return set(
+        Counter.objects.filter(
+            name=counters.FOLLOWERS,
+            value__gte=settings.TIMELINE_PULL_THRESHOLD,
+            object_id__in=author_ids,
+        ).values_list('object_id', flat=True)
+    )
+
+
+@tasks.task
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки.
+
+    Автору над порогом подписчиков лента не нужна: его посты читаются
+    при запросе.
+    """
+    if not is_pulled(author_id):
+        _backfill(user_id, author_id)
+
+
+def _backfill(user_id, author_id):
+    if not Follow.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).exists():
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT]
+    for batch in _batches(posts.iterator(), settings.TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=user_id,
+                    author_id=author_id,
+                    post_id=post_id,
+                    pub_date=pub_date,
+                )
+                for post_id, pub_date in batch
+            ],
+            ignore_conflicts=True,
+        )
+    _timelines_changed([user_id])
+
+
+@tasks.task
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        return
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    _timelines_changed([user_id])
+
+
+@tasks.task
+def settle(author_id):
+    """Раскладывает посты автора, который опустился ниже порога.
+
+    Пока у автора было много подписчиков, его посты читались при запросе
+    и в ленты не попадали. Теперь их получают подписчики, у которых нет
+    последнего поста автора.
+    """
+    followers = Follow.objects.filter(author_id=author_id)
+    if followers.count() >= settings.TIMELINE_PULL_THRESHOLD:
+        return
+    latest = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', flat=True).first()
+    if latest is None:
+        return
+    missing = followers.exclude(
+        user_id__in=TimelineEntry.objects.filter(
+            author_id=author_id, post_id=latest
+        ).values('user_id')
+    ).values_list('user_id', flat=True)
+    # Счетчик подписчиков мог еще не опуститься ниже порога, поэтому
+    # мимо проверки is_pulled в backfill.
+    for user_id in missing.iterator():
+        _backfill(user_id, author_id)
+
+
+def forget_recent_posts(author_id):
+    """Сбрасывает кэш последних постов автора сейчас и после коммита.
+
+    Повтор после коммита нужен, чтобы список, прочитанный другим
+    запросом до коммита, не остался в кэше на весь таймаут.
+    """
+    key = RECENT_POSTS_KEY.format(author_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _load_recent_posts(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('pub_date', 'id')[:settings.TIMELINE_PULL_LIMIT]
+    )
+
+
+def recent_posts(author_ids):
+    """Последние (pub_date, id) постов каждого автора из кэша.
+
+    Недостающие списки читаются из базы и кладутся в кэш одной пачкой.
+    """
+    keys = {RECENT_POSTS_KEY.format(pk): pk for pk in author_ids}
+    cached = cache.get_many(keys)
+    missing = {
+        key: _load_recent_posts(pk)
+        for key, pk in keys.items() if key not in cached
+    }
+    if missing:
+        cache.set_many(missing, settings.TIMELINE_PULL_CACHE_TIMEOUT)
+        cached.update(missing)
+    return {pk: cached[key] for key, pk in keys.items()}
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, чьи посты не раскладываются."""
+    return list(
+        Counter.objects.filter(
+            name=counters.FOLLOWERS,
+            value__gte=settings.TIMELINE_PULL_THRESHOLD,
+            object_id__in=Follow.objects.filter(
+                user=user
+            ).values('author_id'),
+        ).values_list('object_id', flat=True)
+    )
+
+
+class HybridTimelinePaginator(CursorPaginator):
+    """Лента подписок: разложенные записи + посты «тяжелых» авторов.
+
+    Записи из TimelineEntry и списки последних постов авторов над
+    порогом подписчиков сливаются k-way merge по (pub_date, post_id).
+    """
+
+    def __init__(self, object_list, per_page, ordering, user=None):
+        super().__init__(object_list, per_page, ordering)
+        self.user = user
+        self.pulled = pulled_authors(user) if user else []
+
+    def _pulled_stream(self, author_id, recent, values, forward, limit):
+        key = tuple(values) if values is not None else None
+        window_full = len(recent) >= settings.TIMELINE_PULL_LIMIT
+        if forward:
+            rows = [row for row in recent if key is None or row < key]
+            in_window = not window_full or len(rows) >= limit
+        else:
+            rows = [row for row in reversed(recent) if row > key]
+            in_window = not window_full or key >= recent[-1]
+        if not in_window:
+            # Курсор ушел глубже кэшированного окна: читаем автора из базы.
+            lookup = 'lt' if forward else 'gt'
+            posts = Post.objects.filter(author_id=author_id)
+            if key is not None:
+                posts = posts.filter(
+                    Q(**{f'pub_date__{lookup}': key[0]})
+                    | Q(pub_date=key[0], **{f'id__{lookup}': key[1]})
+                )
+            order = ('-pub_date', '-id') if forward else ('pub_date', 'id')
+            rows = list(
+                posts.order_by(*order).values_list('pub_date', 'id')[:limit]
+            )
+        return [
+            TimelineEntry(
+                user=self.user,
+                author_id=author_id,
+                post_id=post_id,
+                pub_date=pub_date,
+            )
+            for pub_date, post_id in rows[:limit]
+        ]
+
+    def _fetch(self, values, forward, offset=0):
+        if not self.pulled:
+            return super()._fetch(values, forward, offset)
+        limit = offset + self.per_page + 1
+        streams = [list(self._stream(values, forward)[:limit])]
+        for author_id, recent in recent_posts(self.pulled).items():
+            streams.append(self._pulled_stream(
+                author_id, recent, values, forward, limit
+            ))
+        merged = heapq.merge(
+            *streams,
+            key=lambda entry: (entry.pub_date, entry.post_id),
+            reverse=forward == self.descending,
+        )
+        items = list(islice(_unique(merged), offset, limit))
+        return _attach_posts(items)
+
+
+def _unique(entries):
+    """Убирает пост, пришедший и из ленты, и из списка автора."""
+    last = None
+    for entry in entries:
+        key = (entry.pub_date, entry.post_id)
+        if key != last:
+            yield entry
+        last = key
+
+
+def _attach_posts(entries):
+    missing = [
+        entry.post_id for entry in entries
+        if not TimelineEntry.post.is_cached(entry)
+    ]
+    posts = Post.objects.select_related('author', 'group').in_bulk(missing)
+    result = []
+    for entry in entries:
+        if entry.post_id in posts:
+            entry.post = posts[entry.post_id]
+        elif not TimelineEntry.post.is_cached(entry):
+            continue
+        result.append(entry)
+    return result
+
+
+def entries_for(user):
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def paginate_feed(request, user):
+    """Страница ленты подписок с постами вместо записей ленты."""
+    page_obj = paginate(
+        request,
+        entries_for(user),
+        ordering=('-pub_date', '-post_id'),
+        paginator_class=HybridTimelinePaginator,
+        user=user,
+    )
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
+    return page_obj
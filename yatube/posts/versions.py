@@ -0,0 +1,102 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'version:{}'
+ALL_POSTS = 'posts'
+
+
+def author(author_id):
+    return f'author:{author_id}'
+
+
+def group(group_id):
+    return f'group:{group_id}'
+
+
+def post(post_id):
+    return f'post:{post_id}'
+
+
+def for_post(instance, *old_group_ids):
+    """Области, которые меняются вместе с постом."""
+    group_ids = {instance.group_id, *old_group_ids}
+    return [
+        ALL_POSTS,
+        author(instance.author_id),
+        post(instance.pk),
+    ] + [group(pk) for pk in sorted(group_ids - {None})]
+
+
+def for_author(author_id, group_ids=()):
+    """Области страниц, где выводится имя автора."""
+    return [ALL_POSTS, author(author_id)] + [
+        group(pk) for pk in sorted(set(group_ids) - {None})
+    ]
+
+
+def now():
+    """Текущее время в микросекундах — значение новой версии."""
+    return int(time.time() * 1000000)
+
+
+def get_many(scopes):
+    """Версии областей (время последнего изменения в микросекундах).
+
+    Если версии нет в кэше (еще не было записи или ее вытеснили), она
+    заводится текущим временем: ключи меняются, и устаревший фрагмент
+    не будет отдан.
+    """
+    keys = {VERSION_KEY.format(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: now() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {scope: found[key] for key, scope in keys.items()}
+
+
+def get(scope):
+    return get_many([scope])[scope]
+
+
+def bump(*scopes):
+    """Отмечает изменение областей; None пропускаются."""
+    version = now()
+    cache.set_many({
+        VERSION_KEY.format(scope): version
+        for scope in scopes if scope is not None
+    }, None)
+
+
+def bump_on_commit(*scopes):
+    """bump сейчас и еще раз после коммита.
+
+    Повтор после коммита нужен, чтобы фрагмент, отрендеренный по старым
+    данным между первым bump и коммитом, не остался под новым ключом.
+    """
+    bump(*scopes)
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def page_cache_key(view_name, scope, page_obj):
+    """Ключ фрагмента страницы ленты.
+
+    Включает вид, область (группа, автор, пользователь), курсор, id
+    постов на странице и версии этих постов, их групп и авторов, так что
+    правка поста, группы или имени автора и новый пост сразу дают новый
+    ключ.
+    """
+    posts = list(page_obj)
+    scopes = [post(item.pk) for item in posts] + sorted({
+        group(item.group_id) for item in posts if item.group_id
+    }) + sorted({author(item.author_id) for item in posts})
+    current = get_many(scopes)
+    return '|'.join([
+        view_name,
+        str(scope),
+        page_obj.cursor,
+        ','.join(str(item.pk) for item in posts),
+        ','.join(str(current[name]) for name in scopes),
+    ])
@@ -1,34 +1,47 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
+from core.uploads import too_large_uploads
+
+from . import counters, export, thumbnails, timeline, versions
+from .conditional import (group_scopes, index_scopes, post_detail_scopes,
+                          profile_scopes, versioned)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator, paginate
+from .search import SearchResults
 
 
+@versioned(index_scopes)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.GLOBAL_COUNT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = paginate(
+        request, post_list, count=counters.get(counters.ALL_POSTS)
+    )
     title = 'Последние обновления на сайте'
     text = 'Последние обновления на сайте'
     context = {
         'page_obj': page_obj,
         'title': title,
         'text': text,
+        'cache_key': versions.page_cache_key('index', '', page_obj),
     }
     return render(request, 'posts/index.html', context)
 
 
+@versioned(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, settings.GLOBAL_COUNT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.select_related('author')
+    page_obj = paginate(
+        request,
+        post_list,
+        count=counters.get(counters.GROUP_POSTS, group.pk)
+    )
     title = f'Записи сообщества {slug}'
     text = 'Записи сообщества: Лев Толстой – зеркало русской революции.'
     context = {
@@ -36,18 +49,24 @@ def group_posts(request, slug):
         'text': text,
         'group': group,
         'page_obj': page_obj,
-        'slug': slug
+        'slug': slug,
+        'cache_key': versions.page_cache_key('group', group.pk, page_obj),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@versioned(profile_scopes)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     post_filter = author.posts.filter(author__username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, settings.GLOBAL_COUNT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = author.posts.select_related('group')
+    counts = counters.get_many((
+        (counters.AUTHOR_POSTS, author.pk),
+        (counters.FOLLOWERS, author.pk),
+        (counters.FOLLOWING, author.pk),
+    ))
+    post_count = counts[(counters.AUTHOR_POSTS, author.pk)]
+    page_obj = paginate(request, post_list, count=post_count)
     title = 'Профайл пользователя'
     if request.user.is_authenticated:
         following = Follow.objects.filter(
@@ -62,22 +81,55 @@ def profile(request, username):
         'author': author,
         'post_filter': post_filter,
         'page_obj': page_obj,
+        'cache_key': versions.page_cache_key('profile', author.pk, page_obj),
         'following': following,
         'profile': profile,
+        'post_count': post_count,
+        'followers_count': counts[(counters.FOLLOWERS, author.pk)],
+        'following_count': counts[(counters.FOLLOWING, author.pk)],
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), settings.GLOBAL_COUNT_POSTS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    title = 'Поиск'
+    context = {
+        'title': title,
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def comment_page(post_id, cursor):
+    """Страница комментариев по (created, id), с авторами."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'id'),
+    )
+    return paginator.get_page(cursor)
+
+
+@versioned(post_detail_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_count = Post.objects.select_related('author').filter(
-        author=post.author
-    ).count()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    counts = counters.get_many((
+        (counters.AUTHOR_POSTS, post.author_id),
+        (counters.POST_COMMENTS, post.pk),
+    ))
+    post_count = counts[(counters.AUTHOR_POSTS, post.author_id)]
     title = 'Пост'
-    comments = post.comments.all()
+    comments = comment_page(post.pk, request.GET.get('comments'))
     form = CommentForm()
     context = {
         'post_count': post_count,
+        'comments_count': counts[(counters.POST_COMMENTS, post.pk)],
         'post': post,
         'title': title,
         'form': form,
@@ -86,9 +138,25 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@versioned(post_detail_scopes)
+def post_comments(request, post_id):
+    """Следующая страница комментариев для «Показать еще»."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comment_page(post_id, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(
+        request.POST or None,
+        files=request.FILES or None,
+        too_large=too_large_uploads(request),
+    )
     context = {
         'form': form,
     }
@@ -98,23 +166,25 @@ def post_create(request):
     user = request.user
     post.author = request.user
     post.save()
+    thumbnails.schedule(post)
     return redirect(f'/profile/{user.username}/')
 
 
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    user = request.user
-    author = post.author
-    if author != user:
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post_id)
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
         instance=post,
+        too_large=too_large_uploads(request),
     )
     if form.is_valid():
         post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -138,14 +208,14 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    list_of_posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(list_of_posts, settings.GLOBAL_COUNT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = timeline.paginate_feed(request, request.user)
     title = 'Лента подписки'
     context = {
         'page_obj': page_obj,
         'title': title,
+        'cache_key': versions.page_cache_key(
+            'follow', request.user.pk, page_obj
+        ),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -167,3 +237,22 @@ def profile_unfollow(request, username):
     if is_follower.exists():
         is_follower.delete()
     return redirect('posts:profile', username=author)
+
+
+@login_required
+def export_content(request):
+    """Выгрузка постов и комментариев пользователя в NDJSON (?gzip=1)."""
+    gzip = request.GET.get('gzip') == '1'
+    filename = f'yatube-{request.user.pk}.ndjson'
+    response = StreamingHttpResponse(
+        export.stream(
+            *export.user_content(request.user),
+            settings.EXPORT_BATCH_SIZE,
+            gzip=gzip,
+        ),
+        content_type='application/gzip' if gzip else 'application/x-ndjson',
+    )
+    if gzip:
+        filename += '.gz'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
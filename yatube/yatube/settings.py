@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -29,6 +30,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -38,6 +40,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.timing.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,7 +55,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.timing.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,6 +80,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Воркеры фоновых задач пишут параллельно: ждем блокировку,
+        # а не падаем сразу.
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -122,14 +128,77 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index_list'
 # LOGIN_REDIRECT_URL = 'posts:profile/<str:username>/'
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма ставятся в очередь задач; воркер отправляет их пачками через
+# EMAIL_DELIVERY_BACKEND (в продакшене — smtp.EmailBackend).
+EMAIL_BACKEND = 'core.mail.OutboxBackend'
+EMAIL_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 GLOBAL_COUNT_POSTS = 10
+# Сколько комментариев показывать сразу и подгружать по «Показать еще».
+COMMENTS_PER_PAGE = 50
+# Наибольший размер страницы JSON API (?limit=).
+API_MAX_PAGE_SIZE = 100
+# Сколько строк читать за запрос при выгрузке export_content.
+EXPORT_BATCH_SIZE = 1000
+# Лента подписок: размер пачки вставки и сколько старых постов автора
+# попадает в ленту при подписке.
+TIMELINE_BATCH_SIZE = 1000
+TIMELINE_BACKFILL_LIMIT = 1000
+# Посты авторов, у которых подписчиков не меньше порога, не раскладываются
+# по лентам, а подмешиваются при чтении из кэша последних постов автора.
+TIMELINE_PULL_THRESHOLD = 10000
+TIMELINE_PULL_LIMIT = 200
+TIMELINE_PULL_CACHE_TIMEOUT = 60 * 60
+# Поиск отдает не больше стольких результатов.
+SEARCH_MAX_RESULTS = 1000
+# Фоновые задачи (core.tasks) выполняет manage.py run_tasks. В тестах
+# они выполняются сразу при постановке в очередь (core.testing).
+TASKS_EAGER = False
+TEST_RUNNER = 'core.testing.TestRunner'
+# Заголовок Server-Timing и строка лога core.timing с замерами SQL,
+# шаблонов, кэша и миниатюр на каждый ответ.
+SERVER_TIMING = DEBUG
+# Метрики Prometheus на /metrics: каждый процесс пишет свой файл в
+# METRICS_DIR, сбор складывает файлы всех процессов. Кроме персонала,
+# /metrics доступны по заголовку Authorization: Bearer METRICS_TOKEN.
+METRICS = True
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube', 'metrics')
+METRICS_FLUSH_INTERVAL = 1
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.timing': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+TASK_CONCURRENCY = 2
+TASK_BATCH_SIZE = 100
+TASK_LEASE = 5 * 60
+TASK_MAX_ATTEMPTS = 5
+# Пауза перед повтором в секундах; удваивается с каждой попыткой.
+TASK_RETRY_DELAY = 10
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загрузки пишутся на диск кусками; картинки постов проверяются по
+# заголовку и при сохранении уменьшаются до POST_IMAGE_MAX_SIDE.
+FILE_UPLOAD_HANDLERS = ['core.uploads.StreamingUploadHandler']
+FILE_UPLOAD_MAX_SIZE = 20 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+POST_IMAGE_MAX_SIDE = 4096
+# Общий для всех процессов-воркеров кэш в файле SQLite.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(
+            tempfile.gettempdir(), 'yatube', 'cache.sqlite3'
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }